@@ -0,0 +1,73 @@
+'''
+Benchmarks the vectorized plant type classification against the row by row
+loop it replaced, on synthetic plant tables 1x, 10x and 100x the size of a
+year of eGRID plants.
+
+Run from the repository root: python -m benchmarks.plant_type
+'''
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from watts_up.data_viz.helper import classify_plant_types
+from watts_up.util.util import PLANT_TAXONOMIES
+
+BASE_ROWS = 12000
+SCALES = [1, 10, 100]
+# the row by row loop takes minutes beyond this many rows
+MAX_LOOP_ROWS = 150000
+
+
+def plant_type_loop(df, wanted_columns):
+    """The row by row plant type classification that
+    classify_plant_types replaced, kept as the reference."""
+    df['plant_type'] = 'Other'
+
+    for index, row in df.iterrows():
+        max_capacity = 0
+        max_type = 'Other'
+
+        for col, type_name in wanted_columns.items():
+            if row[col] > max_capacity:
+                max_capacity = row[col]
+                max_type = type_name
+
+        df.at[index, 'plant_type'] = max_type
+
+    return df
+
+
+def synthetic_plants(n_rows, columns, seed=0):
+    """Builds a plant table with missing, zero, negative and tied values."""
+    rng = np.random.default_rng(seed)
+    values = rng.exponential(1000, (n_rows, len(columns))).round(-2)
+    values[rng.random(values.shape) < 0.3] = 0
+    values[rng.random(values.shape) < 0.1] = np.nan
+    values[rng.random(values.shape) < 0.02] = -5
+    return pd.DataFrame(values, columns=columns)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    for name, wanted_columns in PLANT_TAXONOMIES.items():
+        for scale in SCALES:
+            n_rows = BASE_ROWS * scale
+            df = synthetic_plants(n_rows, list(wanted_columns))
+            fast, fast_time = timed(classify_plant_types, df, wanted_columns)
+            line = f"{name:>8} {scale:>4}x {n_rows:>9} rows  vectorized {fast_time:8.3f}s"
+            if n_rows <= MAX_LOOP_ROWS:
+                slow, slow_time = timed(plant_type_loop, df.copy(), wanted_columns)
+                assert (slow['plant_type'] == fast).all()
+                line += f"  loop {slow_time:8.3f}s  speedup {slow_time / fast_time:7.0f}x"
+            print(line)
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
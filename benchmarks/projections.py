@@ -0,0 +1,104 @@
+'''
+Benchmarks the batched NumPy regressions of the renewable share projections
+against the per-state statsmodels loop they replaced, on synthetic state
+tables with 1x, 10x and 100x as many states as the eGRID data.
+
+Run from the repository root: python -m benchmarks.projections
+'''
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from sklearn.model_selection import train_test_split
+from watts_up.data_viz.regression_predict import (fit_state_regressions,
+                                                  predict_renewable_energy)
+
+BASE_STATES = 51
+SCALES = [1, 10, 100]
+YEARS = [2004, 2005, 2007, 2009, 2010, 2012, 2014, 2016, 2018, 2019, 2020,
+         2021, 2022]
+PERCENT_REQUIRED = 60
+
+
+def predict_renewable_energy_loop(data, percent_required):
+    """The previous per-state implementation of predict_renewable_energy,
+    returning the coefficients and p-values along with its results."""
+    results = []
+    fits = []
+    grouped_data = data.groupby('state_id')
+    for state, state_data in grouped_data:
+        train_data, _ = train_test_split(state_data, test_size=0.2,
+                                         random_state=100)
+        X_train = sm.add_constant(train_data[['Percentage_Renewable']])
+        model = sm.OLS(train_data['year'], X_train).fit()
+        fits.append({'state_id': state,
+                     'intercept': model.params['const'],
+                     'slope': model.params['Percentage_Renewable'],
+                     'p_value': model.pvalues['Percentage_Renewable']})
+        if state_data["Percentage_Renewable"].iloc[-1] < percent_required:
+            p_value = model.pvalues['Percentage_Renewable']
+            predicted_year = round(model.predict([1, percent_required])[0])
+            statistically_significant = 'Yes' if p_value < 0.05 else 'No'
+            if predicted_year >= pd.to_datetime('today').year:
+                predicted_year = int(predicted_year)
+            else:
+                predicted_year = 'Not predictable'
+            results.append({'state_id': state,
+                            'predicted_year': predicted_year,
+                            'statistically_significant':
+                            statistically_significant})
+        else:
+            results.append({'state_id': state,
+                            'predicted_year': 'Already there!',
+                            'statistically_significant':
+                            statistically_significant})
+    return pd.DataFrame(results), pd.DataFrame(fits).set_index('state_id')
+
+
+def synthetic_states(n_states, seed=0):
+    """Builds the renewable share of each state and year, growing at a
+    random pace, with a few states already past PERCENT_REQUIRED."""
+    rng = np.random.default_rng(seed)
+    states = [f"S{i:04d}" for i in range(n_states)]
+    start = rng.uniform(5, 40, n_states)
+    pace = rng.uniform(-0.2, 3, n_states)
+    years = np.array(YEARS)
+    share = (start[:, None] + pace[:, None] * (years - years[0])
+             + rng.normal(0, 1, (n_states, len(years))))
+    # a state past the target takes the significance of the state before
+    # it in the loop, so the first state must be below it
+    share[1::7] += 60
+    return pd.DataFrame({
+        'state_id': np.repeat(states, len(years)),
+        'year': np.tile(years, n_states),
+        'Percentage_Renewable': share.ravel(),
+    })
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    for scale in SCALES:
+        data = synthetic_states(BASE_STATES * scale)
+        (slow, slow_fits), slow_time = timed(predict_renewable_energy_loop,
+                                             data, PERCENT_REQUIRED)
+        fast, fast_time = timed(predict_renewable_energy, data,
+                                PERCENT_REQUIRED)
+        fits = fit_state_regressions(data)
+        np.testing.assert_allclose(fits.to_numpy(), slow_fits.to_numpy(),
+                                   rtol=1e-7, atol=1e-9)
+        pd.testing.assert_frame_equal(fast, slow)
+        print(f"{scale:>4}x {data['state_id'].nunique():>6} states  "
+              f"batched {fast_time:8.3f}s  loop {slow_time:8.3f}s  "
+              f"speedup {slow_time / fast_time:6.0f}x")
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
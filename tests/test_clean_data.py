@@ -0,0 +1,58 @@
+'''
+Tests the cleaning of the plant sheets of the eGRID workbooks
+'''
+
+import openpyxl
+import pyarrow as pa
+from watts_up.data_processing.extract_data.import_data import read_PLNT_sheet
+from watts_up.data_processing.clean_data.clean_data import (clean_plant_frame,
+                                                            conform_plant_frame)
+from watts_up.data_processing.columnar import arrow_schema
+from watts_up.data_processing.load_data.schema import PLANT_COLUMNS
+
+
+def write_workbook(path, rows):
+    """Writes an eGRID-like workbook: a title row, then the header and the
+    rows of the PLNT20 sheet."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "PLNT20"
+    sheet.append(["eGRID2020 Plant file"])
+    sheet.append(["YEAR", "PSTATABB", "PNAME", "ORISPL", "FIPSST",
+                  "NAMEPCAP", "PLGENACL"])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def test_blank_rows_are_dropped(tmp_path):
+    write_workbook(tmp_path / "eGRID2020_data.xlsx", [
+        [2020, "IL", "Plant A", 1, 17, 100.0, 50.0],
+        [None] * 7,
+        [None, "IL", "Plant B", 2, 17, 80.0, 10.0],
+        [2020, "WI", "Plant C", 3, None, 20.0, None],
+    ])
+    _, df, _ = read_PLNT_sheet(str(tmp_path), "eGRID2020_data.xlsx")
+
+    cleaned = clean_plant_frame(df)
+    assert cleaned["pname"].tolist() == ["Plant A", "Plant C"]
+    assert cleaned["year_state"].tolist() == ["2020_IL", "2020_WI"]
+
+    table = pa.Table.from_pandas(conform_plant_frame(cleaned),
+                                 schema=arrow_schema(PLANT_COLUMNS),
+                                 preserve_index=False)
+    assert table.column("year").to_pylist() == [2020, 2020]
+    assert table.column("fipsst").to_pylist() == [17, None]
+
+
+def test_blank_rows_with_text_years(tmp_path):
+    write_workbook(tmp_path / "eGRID2020_data.xlsx", [
+        ["2020", "IL", "Plant A", 1, 17, 100.0, 50.0],
+        [None] * 7,
+        ["2020", "WI", "Plant C", 3, 55, 20.0, None],
+    ])
+    _, df, _ = read_PLNT_sheet(str(tmp_path), "eGRID2020_data.xlsx")
+
+    cleaned = clean_plant_frame(df)
+    assert cleaned["year"].tolist() == [2020, 2020]
+    assert cleaned["state_id"].tolist() == ["IL", "WI"]
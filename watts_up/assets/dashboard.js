@@ -0,0 +1,40 @@
+/*
+Draws the State Trends chart in the browser from the state-year series
+stored with the page, so dropdown changes do not reach the server.
+
+Author: Frank Vasquez
+*/
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dashboard: {
+        // the line chart of a trend in a state, one line per series
+        main_plot: function (state, trend, store) {
+            if (!store || !store.trends[trend]) {
+                return window.dash_clientside.no_update;
+            }
+            const spec = store.trends[trend];
+            const series = store[spec.table][state] || {year: []};
+            const colors = ['#636efa', '#EF553B', '#00cc96', '#ab63fa'];
+            const data = spec.columns.map((column, i) => ({
+                type: 'scatter',
+                mode: 'lines',
+                x: series.year,
+                y: series[column] || [],
+                name: column,
+                line: {color: colors[i % colors.length]},
+                showlegend: spec.legend !== null,
+            }));
+            return {
+                data: data,
+                layout: {
+                    title: {text: spec.title + ' ' + state},
+                    xaxis: {title: {text: 'year'}, gridcolor: '#E5ECF6'},
+                    yaxis: {title: {text: spec.yaxis}, gridcolor: '#E5ECF6'},
+                    legend: {title: {text: spec.legend || ''}},
+                    paper_bgcolor: 'white',
+                    plot_bgcolor: 'white',
+                },
+            };
+        },
+    },
+});
@@ -0,0 +1,57 @@
+/*
+Draws the predict page animation in the browser from the predictions stored
+by the server, so the server sends them once rather than a copy per year.
+
+Author: Frank Vasquez
+*/
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    predict: {
+        // moves the animation to its next year: the play button starts it
+        // from the first year, the interval steps it and new predictions
+        // reset it
+        step: function (n_clicks, n_intervals, data, year) {
+            const no_update = window.dash_clientside.no_update;
+            if (!data || data.min_year === null) {
+                return [0, true];
+            }
+            const triggered = window.dash_clientside.callback_context.triggered
+                .map(t => t.prop_id);
+            if (triggered.includes('play-button.n_clicks')) {
+                return [data.min_year, false];
+            }
+            if (triggered.includes('animation-interval.n_intervals')) {
+                if (year >= data.max_year) {
+                    return [no_update, true];
+                }
+                return [year + 1, year + 1 >= data.max_year];
+            }
+            return [data.min_year, true];
+        },
+
+        // the bar chart of a year: the states reaching the target by then
+        progress_figure: function (year, data) {
+            if (!data || data.min_year === null) {
+                return {data: [], layout: {title: {text: 'No state is projected to reach the target'}}};
+            }
+            const display_year = data.predicted_year.map(y => (y <= year ? y : null));
+            return {
+                data: [{
+                    type: 'bar',
+                    x: data.state_id,
+                    y: display_year,
+                    hovertemplate: 'State=%{x}<br>Predicted Year=%{y}<extra></extra>',
+                }],
+                layout: {
+                    title: {text: data.title + ' (' + year + ')'},
+                    xaxis: {title: {text: 'State'}, showline: true, showgrid: false, linecolor: 'black',
+                            categoryorder: 'array', categoryarray: data.state_id},
+                    yaxis: {title: {text: 'Predicted Year'}, showgrid: true, gridcolor: 'lightgrey',
+                            range: [data.min_year, data.max_year]},
+                    plot_bgcolor: 'white',
+                    transition: {duration: 50},
+                },
+            };
+        },
+    },
+});
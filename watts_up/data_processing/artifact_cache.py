@@ -0,0 +1,174 @@
+'''
+This file keeps the per-workbook artifacts of the eGRID stages, keyed by a
+hash of the workbook content and of the code and columns used to build them,
+so workbooks that did not change are never parsed or cleaned again. Entries
+not used by the last run of their stage are removed
+'''
+
+import hashlib
+import inspect
+import json
+import pathlib
+from watts_up.data_processing.columnar import write_table, write_batches
+
+
+CACHE_DIR = (pathlib.Path(__file__).parent.parent /
+             "data/intermediate_data/egrid_cache")
+
+
+def file_digest(path):
+    """
+    Computes the hash of a file's content.
+
+    Args:
+        path (pathlib.Path): The path of the file.
+
+    Returns:
+        str: The hex digest of the content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_digest(*functions):
+    """
+    Computes a hash of the source code of functions, so a cache entry is
+    invalidated when the code that built it changes.
+
+    Args:
+        functions (callable): The functions building the artifact.
+
+    Returns:
+        str: The hex digest of the source code.
+    """
+    digest = hashlib.sha256()
+    for function in functions:
+        digest.update(inspect.getsource(function).encode())
+    return digest.hexdigest()
+
+
+def cache_key(stage, *parts):
+    """
+    Combines the parts identifying an artifact into a cache key.
+
+    Args:
+        stage (str): The name of the stage building the artifact.
+        parts: JSON serializable values the artifact depends on.
+
+    Returns:
+        str: The cache key, prefixed by the stage name.
+    """
+    key = json.dumps(parts, sort_keys=True)
+    return stage + "-" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def lookup(key, cache_dir=CACHE_DIR):
+    """
+    Finds a cached artifact.
+
+    Args:
+        key (str): The cache key of the artifact.
+        cache_dir (pathlib.Path): The directory of the cache.
+
+    Returns:
+        pathlib.Path: The path of the cached Parquet file, or None.
+    """
+    path = pathlib.Path(cache_dir) / f"{key}.parquet"
+    return path if path.exists() else None
+
+
+def store_frame(key, df, cache_dir=CACHE_DIR):
+    """
+    Writes a DataFrame into the cache.
+
+    Args:
+        key (str): The cache key of the artifact.
+        df (pd.DataFrame): The artifact to cache.
+        cache_dir (pathlib.Path): The directory of the cache.
+
+    Returns:
+        pathlib.Path: The path of the cached Parquet file.
+    """
+    cache_dir = pathlib.Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # write then rename so a crash never leaves a partial entry
+    tmp_path = cache_dir / f"{key}.tmp.parquet"
+    write_table(df, tmp_path)
+    return tmp_path.replace(cache_dir / f"{key}.parquet")
+
+
+def store_batches(key, frames, schema, cache_dir=CACHE_DIR):
+    """
+    Writes DataFrames one after the other into a cached Parquet file.
+
+    Args:
+        key (str): The cache key of the artifact.
+        frames (iterable): The DataFrames making up the artifact.
+        schema (pa.Schema): The schema of the artifact.
+        cache_dir (pathlib.Path): The directory of the cache.
+
+    Returns:
+        pathlib.Path: The path of the cached Parquet file.
+    """
+    cache_dir = pathlib.Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # write then rename so a crash never leaves a partial entry
+    tmp_path = cache_dir / f"{key}.tmp.parquet"
+    write_batches(frames, tmp_path, schema)
+    return tmp_path.replace(cache_dir / f"{key}.parquet")
+
+
+def load_metadata(key, cache_dir=CACHE_DIR):
+    """
+    Loads the metadata stored alongside a cached artifact.
+
+    Args:
+        key (str): The cache key of the artifact.
+        cache_dir (pathlib.Path): The directory of the cache.
+
+    Returns:
+        The stored metadata, or None.
+    """
+    path = pathlib.Path(cache_dir) / f"{key}.json"
+    if not path.exists():
+        return None
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def store_metadata(key, metadata, cache_dir=CACHE_DIR):
+    """
+    Stores metadata alongside a cached artifact.
+
+    Args:
+        key (str): The cache key of the artifact.
+        metadata: JSON serializable metadata.
+        cache_dir (pathlib.Path): The directory of the cache.
+    """
+    cache_dir = pathlib.Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with open(cache_dir / f"{key}.json", "w") as file:
+        json.dump(metadata, file)
+
+
+def prune(stage, used_keys, cache_dir=CACHE_DIR):
+    """
+    Removes the artifacts of a stage that were not used by its last run, so
+    the entries made stale by changed workbooks, code or columns do not
+    accumulate.
+
+    Args:
+        stage (str): The name of the stage building the artifacts.
+        used_keys (iterable): The cache keys used by the run.
+        cache_dir (pathlib.Path): The directory of the cache.
+    """
+    used_keys = set(used_keys)
+    for path in pathlib.Path(cache_dir).glob(f"{stage}-*"):
+        # the key is the file name up to the first dot; leftover temporary
+        # files of an interrupted write are removed too
+        key = path.name.split(".")[0]
+        if key not in used_keys or ".tmp." in path.name:
+            path.unlink()
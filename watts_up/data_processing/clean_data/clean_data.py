@@ -4,63 +4,132 @@ data to prepare for database creation
 Authors: Jacob Trout and Praveen Devarajan 
 """
 
+import numpy as np
 import pandas as pd
 import pathlib
-import os
 import json
 import regex as re
-from io import StringIO
-from watts_up.util.util import COL_NAMES, STATE_MAPPING_DATA
+from watts_up.data_processing import artifact_cache
+from watts_up.data_processing.columnar import write_table, write_batches, iter_table, arrow_schema
+from watts_up.data_processing.load_data.schema import PLANT_COLUMNS
+from watts_up.util.util import COL_NAMES, STATE_MAPPING_DATA, PLANT_CHUNK_SIZE
 
 
 DATA_DIR_OUTPUT = pathlib.Path(__file__).parent.parent.parent / "data/final_data"
 DATA_DIR_INPUT = pathlib.Path(__file__).parent.parent.parent / "data/raw_data/gdp_pop"
 STATE_MAPPING = pd.DataFrame(STATE_MAPPING_DATA)
 
-def clean_plant_data():
+def clean_plant_frame(df):
     """
-    This function should load the data in the excel files from egrid_data folder
-    and returns a uncleaned Pandas DataFrame
+    This function cleans the plant data of a single egrid file: it adds the
+    year_state id and keeps the desired columns available in the file.
+
+    Args:
+        df (pd.DataFrame): The plant data of one egrid file.
 
     Returns:
-        A dictionary of PandasDataframes
+        pd.DataFrame: The cleaned plant data, with lower case column names.
     """
-    # Read the JSON file
-    output_dir = pathlib.Path(__file__).parent.parent.parent / "data/intermediate_data"
-    json_file_path = output_dir / "plant_data.json"
-
-    with open(json_file_path, "r") as json_file:
-        json_dataframes = json.load(json_file)
-
-    # Convert JSON data back to DataFrames
-    dict_of_dfs = {}
-    for key, json_string in json_dataframes.items():
-        dict_of_dfs[key] = pd.read_json(StringIO(json_string))
+    # rename state_id column
+    df = df.rename(columns={"PSTATABB": "state_id"})
+    # years detected from the file name are strings, and blank cells are
+    # missing years
+    df["YEAR"] = pd.to_numeric(df["YEAR"], errors="coerce")
+    # drop the blank rows inside a sheet (only trailing ones are dropped when
+    # it is read) and the rows without a year
+    data_columns = df.columns.difference(["YEAR", "FILE"])
+    df = df.dropna(how="all", subset=data_columns).dropna(subset=["YEAR"])
+    df["YEAR"] = df["YEAR"].astype(int)
+    df["year_state"] = df["YEAR"].astype(str) + "_" + df["state_id"]
+    cols_available = [col for col in COL_NAMES if col in df.columns]
+
+    # filter to desired columns that are available in df
+    df2 = df[cols_available].copy()
+    df2.columns = df2.columns.str.lower()
+    return df2
+
+
+def conform_plant_frame(df):
+    """
+    This function gives cleaned plant data the columns and types of the
+    plants table, so every chunk of plant data has the same schema. Columns
+    missing from an egrid file are added as empty columns.
 
-    # Now dfs is your dictionary of DataFrames
-    df_all = pd.DataFrame()
+    Args:
+        df (pd.DataFrame): Cleaned plant data.
 
-    for name, df in dict_of_dfs.items():
-        # rename state_id column
-        df.rename(columns={"PSTATABB": "state_id"}, inplace=True)
-        df["year_state"] = df["YEAR"].astype(str) + "_" + df["state_id"]
-        cols_available = [col for col in COL_NAMES if col in df.columns]
+    Returns:
+        pd.DataFrame: The plant data with the columns of PLANT_COLUMNS.
+    """
+    conformed = pd.DataFrame(index=df.index)
+    for col, col_type in PLANT_COLUMNS.items():
+        values = df[col] if col in df.columns else \
+            pd.Series(None, index=df.index, dtype=object)
+        if col_type == "TEXT":
+            conformed[col] = values.map(
+                lambda value: None if pd.isna(value) else str(value))
+        elif col_type == "INTEGER":
+            # blank cells and missing columns become NaN, which the Parquet
+            # writer stores as a null integer
+            conformed[col] = np.trunc(pd.to_numeric(values, errors="coerce"))
+        else:
+            conformed[col] = pd.to_numeric(values, errors="coerce")\
+                .astype("float64")
+    return conformed
+
+
+def iter_plant_chunks(chunk_size=PLANT_CHUNK_SIZE):
+    """
+    This function streams the cleaned plant data of every egrid file, one
+    chunk of rows at a time, so the data of all files and years is never in
+    memory at once. Files cleaned before with the same content, code and
+    COL_NAMES are read from the artifact cache, the others are cleaned and
+    cached chunk by chunk.
+
+    Args:
+        chunk_size (int): The maximum number of rows in a chunk.
+
+    Yields:
+        pd.DataFrame: The next chunk of cleaned plant data, with the columns
+          of the plants table.
+    """
+    plant_dir = pathlib.Path(__file__).parent.parent.parent / "data/intermediate_data/plant_data"
+    code_version = artifact_cache.code_digest(
+        clean_plant_frame, conform_plant_frame, write_batches)
+    schema = arrow_schema(PLANT_COLUMNS)
+
+    used_keys = []
+    for path in sorted(plant_dir.glob("*.parquet")):
+        key = artifact_cache.cache_key("cleaned", code_version, COL_NAMES,
+                                       PLANT_COLUMNS,
+                                       artifact_cache.file_digest(path))
+        used_keys.append(key)
+        cached = artifact_cache.lookup(key)
+        if cached is None:
+            chunks = (conform_plant_frame(clean_plant_frame(chunk))
+                      for chunk in iter_table(path, chunk_size))
+            cached = artifact_cache.store_batches(key, chunks, schema)
+        yield from iter_table(cached, chunk_size)
+
+    # drop the cached files of data, code or columns no longer in use
+    artifact_cache.prune("cleaned", used_keys)
 
-        # filter to desired columns that are available in df
-        df2 = df[cols_available].copy()
-        df_all = pd.concat([df_all, df2], ignore_index=True)
 
-    df_all.columns = df_all.columns.str.lower()
-    json_data = df_all.to_json(orient="records")
-    with open(os.path.join(DATA_DIR_OUTPUT, "cleaned_egrid_data.json"), "w") as f:
-        f.write(json_data)
+def clean_plant_data():
+    """
+    This function loads the plant data of each egrid file from the Parquet
+    files written by import_PLNT_sheet_data, keeps the desired columns and
+    streams the combined data to cleaned_egrid_data.parquet.
+    """
+    write_batches(iter_plant_chunks(), DATA_DIR_OUTPUT /
+                  "cleaned_egrid_data.parquet", arrow_schema(PLANT_COLUMNS))
 
 
 def clean_price_data():
     """
     Cleans raw price data obtained from API responses stored in a JSON file.
     Reads the JSON file containing API responses, extracts relevant data, and
-    creates a pandas DataFrame. Then writes the output to a new JSON.
+    creates a pandas DataFrame. Then writes the output to a Parquet file.
     """
     data_list = []
     pd_list = []
@@ -104,18 +173,14 @@ def clean_price_data():
 
     df_pivoted.columns.name = None
 
-    # Writing the cleaned data to a json file
-    json_data = df_pivoted.to_json(orient="records")
-
-    with open(os.path.join(DATA_DIR_OUTPUT, \
-                           "cleaned_api_responses.json"), "w") as file:
-        file.write(json_data)
+    # Writing the cleaned data to a Parquet file
+    write_table(df_pivoted, DATA_DIR_OUTPUT / "cleaned_api_responses.parquet")
 
 
 def clean_gdp_data():
     """
     Cleans raw GDP data from a CSV file and writes the cleaned data to a
-    JSON file.
+    Parquet file.
     """
 
     raw_gdp_path = pathlib.Path(DATA_DIR_INPUT) / "gdp.csv"
@@ -135,17 +200,14 @@ def clean_gdp_data():
     merged_df["year_state"] = (
         merged_df["year"].astype(str) + "_" + merged_df["stateid"].astype(str))
 
-    # Make the json file
-    json_data = merged_df.to_json(orient="records")
-    with open(pathlib.Path(DATA_DIR_OUTPUT) / "gdp_numbers.json", "w") as \
-                                                                    json_file:
-        json_file.write(json_data)
+    # Make the Parquet file
+    write_table(merged_df, DATA_DIR_OUTPUT / "gdp_numbers.parquet")
 
 
 def clean_pop_data():
     """
     Cleans raw population data from CSV files and writes the cleaned data to a
-    JSON file.
+    Parquet file.
     """
     pop_2019_path = pathlib.Path(DATA_DIR_INPUT) / "p1.csv"
     pop_2022_path = pathlib.Path(DATA_DIR_INPUT) / "p2.csv"
@@ -199,8 +261,5 @@ def clean_pop_data():
     mapped_df["population"] = mapped_df["population"].\
         str.replace(",", "").astype(int)
 
-    # Make the json file
-    json_data = mapped_df.to_json(orient="records")
-    with open(os.path.join(DATA_DIR_OUTPUT, "pop_numbers.json"), "w") as\
-                                                                     json_file:
-        json_file.write(json_data)
+    # Make the Parquet file
+    write_table(mapped_df, DATA_DIR_OUTPUT / "pop_numbers.parquet")
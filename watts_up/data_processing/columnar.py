@@ -0,0 +1,109 @@
+'''
+This file reads and writes the intermediate and final ETL artifacts as
+Parquet files, so the data types of each column are kept between stages
+'''
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Parquet types of the SQLite column types
+ARROW_TYPES = {
+    "TEXT": pa.string(),
+    "REAL": pa.float64(),
+    "INT": pa.float64(),
+    "INTEGER": pa.int64()
+}
+
+
+def arrow_safe(df):
+    """
+    Converts the object columns holding a mix of types (e.g. numbers and
+    strings in the same Excel column) to strings, since a Parquet column
+    has a single type. Missing values are kept as missing.
+
+    Args:
+        df (pd.DataFrame): The data to write.
+
+    Returns:
+        pd.DataFrame: The data with every column of a single type.
+    """
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        kind = pd.api.types.infer_dtype(df[col], skipna=True)
+        if kind.startswith("mixed"):
+            df[col] = df[col].map(lambda value: value if pd.isna(value)
+                                  else str(value))
+    return df
+
+
+def write_table(df, path):
+    """
+    Writes a DataFrame to a Parquet file.
+
+    Args:
+        df (pd.DataFrame): The data to write.
+        path (pathlib.Path): The path of the Parquet file.
+    """
+    arrow_safe(df).to_parquet(path, index=False)
+
+
+def read_table(path, columns=None):
+    """
+    Reads a Parquet file written by write_table. The file is memory-mapped
+    instead of being copied into memory before decoding.
+
+    Args:
+        path (pathlib.Path): The path of the Parquet file.
+        columns (list): The columns to read, or None for all of them.
+
+    Returns:
+        pd.DataFrame: The data of the file.
+    """
+    return pd.read_parquet(path, columns=columns, memory_map=True)
+
+
+def arrow_schema(columns):
+    """
+    Builds the Parquet schema of a table from its SQLite column types.
+
+    Args:
+        columns (dict): Maps each column name to its SQLite type.
+
+    Returns:
+        pa.Schema: The schema of the table.
+    """
+    return pa.schema([(col, ARROW_TYPES[col_type])
+                      for col, col_type in columns.items()])
+
+
+def write_batches(frames, path, schema):
+    """
+    Writes DataFrames one after the other to a Parquet file, so only one of
+    them is in memory at a time. Each DataFrame must match the schema.
+
+    Args:
+        frames (iterable): The DataFrames to write.
+        path (pathlib.Path): The path of the Parquet file.
+        schema (pa.Schema): The schema of the file.
+    """
+    with pq.ParquetWriter(path, schema) as writer:
+        for df in frames:
+            writer.write_table(pa.Table.from_pandas(df, schema=schema,
+                                                    preserve_index=False))
+
+
+def iter_table(path, chunk_size):
+    """
+    Reads a Parquet file in chunks of rows.
+
+    Args:
+        path (pathlib.Path): The path of the Parquet file.
+        chunk_size (int): The maximum number of rows in a chunk.
+
+    Yields:
+        pd.DataFrame: The next chunk of rows.
+    """
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
@@ -10,10 +10,118 @@ import json
 import pandas as pd
 import re
 import pathlib
+import shutil
+import openpyxl
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from watts_up.data_processing.extract_data import response_cache
+from watts_up.data_processing import artifact_cache
+from watts_up.data_processing.columnar import write_table, arrow_safe
+from watts_up.util.util import (FETCH_WORKERS, FETCH_RETRIES, FETCH_BACKOFF,
+                                FETCH_TIMEOUT, EGRID_WORKERS, COL_NAMES,
+                                PROCESS_START_METHOD)
 
 
+def make_session(retries=FETCH_RETRIES, backoff=FETCH_BACKOFF,
+                 pool_size=FETCH_WORKERS):
+    """
+    Builds a pooled HTTP session that retries failed requests with
+    exponential backoff.
+
+    Args:
+        retries (int): The number of times a failed request is retried.
+        backoff (float): The backoff factor in seconds between retries.
+        pool_size (int): The number of connections kept open to the host.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"]
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size,
+                          pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
-def fetch_electricity_data(url, params):
+def fetch_page(session, url, params, offset, cache_dir=None):
+    """
+    Fetches a single page of the EIA API starting at the given offset. When a
+    cache directory is given, a cached copy of the page is revalidated with a
+    conditional request and reused if the server reports it as unchanged.
+
+    Args:
+        session (requests.Session): The session used for the request.
+        url (str): The URL of the EIA API.
+        params (dict): The request parameters. They are not modified.
+        offset (int): The offset of the first record of the page.
+        cache_dir (pathlib.Path): The directory of the response cache, or
+          None to bypass the cache.
+
+    Returns:
+        dict: The decoded JSON response of the page.
+    """
+    page_params = dict(params, offset=offset)
+    key, entry, headers = None, None, {}
+    if cache_dir is not None:
+        key = response_cache.fingerprint(url, page_params)
+        entry = response_cache.load_entry(cache_dir, key)
+        headers = response_cache.conditional_headers(entry)
+
+    response = session.get(url, params=page_params, headers=headers,
+                           timeout=FETCH_TIMEOUT)
+    if response.status_code == 304 and entry is not None:
+        return entry["response"]
+    # raises for any non-200 status left after the retries
+    response.raise_for_status()
+    page = response.json()
+    if cache_dir is not None:
+        response_cache.store_entry(cache_dir, key, page, response.headers)
+    return page
+
+
+def fetch_all_pages(session, url, params, max_workers=FETCH_WORKERS,
+                    cache_dir=None):
+    """
+    Fetches every page of an EIA API query. The first page is used to learn
+    the total number of records, the remaining pages are then fetched
+    concurrently.
+
+    Args:
+        session (requests.Session): The session used for the requests.
+        url (str): The URL of the EIA API.
+        params (dict): The request parameters, including length.
+        max_workers (int): The maximum number of pages fetched at once.
+        cache_dir (pathlib.Path): The directory of the response cache, or
+          None to bypass the cache.
+
+    Returns:
+        list: The responses of all pages, in offset order.
+    """
+    first_page = fetch_page(session, url, params, 0, cache_dir)
+    total_records = int(first_page["response"]["total"])
+    offsets = range(params["length"], total_records, params["length"])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map returns results in the order of the offsets
+        other_pages = executor.map(
+            lambda offset: fetch_page(session, url, params, offset,
+                                      cache_dir),
+            offsets)
+        return [first_page] + list(other_pages)
+
+
+def fetch_electricity_data(url, params, max_workers=FETCH_WORKERS,
+                           incremental=False,
+                           cache_dir=response_cache.CACHE_DIR):
     """
     Fetches electricity retail sales data from the U.S. 
     Energy Information Administration (EIA) API.
@@ -23,6 +131,11 @@ def fetch_electricity_data(url, params):
         retail sales data.
         params (dict): The parameters to be included in the API request,
           including offset and length.
+        max_workers (int): The maximum number of pages fetched at once.
+        incremental (bool): If True, only the periods newer than the latest
+          period already saved are requested and appended to the saved data.
+        cache_dir (pathlib.Path): The directory of the response cache, or
+          None to bypass the cache.
 
     Returns:
         None: The fetched data is saved to a JSON file, and the
@@ -33,79 +146,176 @@ def fetch_electricity_data(url, params):
                   "data/intermediate_data")
     output_file = output_dir / "api_responses.json"
 
-    def fetch_page(offset):
-        
-        params["offset"] = offset
-        response = requests.get(url, params = params)
-        if response.status_code == 200:
-            return response.json()
-        
-        # API request failure (non-200 status code)
-        print(f"API request failed with status code {response.status_code}.")
-        return None
-
-    offset = 0
-    responses =[]
-
-    # fetch pages of data until all records are retrieved
-    while True:
-        page_data = fetch_page(offset)
-        if page_data:
-            responses.append(page_data)
-            total_records = int(page_data["response"]["total"])
-            if total_records <= offset + params["length"]:
-                break
-            else:
-                offset += params["length"]
-        else:
-            print("Exiting due to API request failure.")
-            break
+    responses = []
+    if incremental and output_file.exists():
+        with open(output_file, "r") as file:
+            responses = json.load(file)
+        latest = response_cache.latest_period(responses)
+        if latest is not None:
+            # ask for everything after the latest period: the fixed end of
+            # a full fetch would exclude the periods published since
+            params = {key: value for key, value in params.items()
+                      if key != "end"}
+            params["start"] = str(int(latest[:4]) + 1)
+
+    # a failed page raises instead of silently truncating the data
+    with make_session(pool_size=max_workers) as session:
+        new_pages = fetch_all_pages(session, url, params, max_workers,
+                                    cache_dir)
+    responses += [page for page in new_pages if page["response"]["data"]]
     
     with open(output_file, "w") as file:
         json.dump(responses, file)
 
-def import_PLNT_sheet_data():
+def read_projected_sheet(filename, sheet, header, columns):
+    """
+    This function reads only the wanted columns of an Excel sheet. .xlsx
+    files are streamed row by row in read-only mode, so the columns that are
+    not wanted are never turned into Python objects. Older .xls files are
+    read with xlrd and filtered while parsing.
+
+    Args:
+        filename (str): The path of the Excel file.
+        sheet (str): The name of the sheet.
+        header (int): The (0-indexed) row holding the column names.
+        columns (list): The names of the columns to keep.
+
+    Returns:
+        (pd.DataFrame, list): The projected data and the names of the
+          columns that were skipped.
+    """
+    wanted = set(columns)
+    skipped = []
+
+    if filename.endswith(".xls"):
+        def use_column(name):
+            if name in wanted:
+                return True
+            skipped.append(name)
+            return False
+
+        df = pd.read_excel(filename, header=header, sheet_name=sheet,
+                           usecols=use_column)
+        return df, skipped
+
+    workbook = openpyxl.load_workbook(filename, read_only=True,
+                                      data_only=True)
+    try:
+        worksheet = workbook[sheet]
+        rows = worksheet.iter_rows(min_row=header + 1, values_only=True)
+        header_row = next(rows, ())
+        keep = [i for i, name in enumerate(header_row) if name in wanted]
+        skipped = [name for name in header_row
+                   if name is not None and name not in wanted]
+        data = [tuple(row[i] if i < len(row) else None for i in keep)
+                for row in rows]
+    finally:
+        workbook.close()
+
+    # drop trailing empty rows, as pd.read_excel does
+    while data and all(value is None for value in data[-1]):
+        data.pop()
+    df = pd.DataFrame(data, columns=[header_row[i] for i in keep])
+    return df, skipped
+
+
+def read_PLNT_sheet(folder_path, file):
+    """
+    This function reads the plant sheet of a single eGRID Excel file. The
+    year of the file is detected from its name and used to pick the sheet
+    and the header row. Only the columns listed in COL_NAMES are read.
+
+    Args:
+        folder_path (str): The folder holding the eGRID files.
+        file (str): The name of the eGRID file.
+
+    Returns:
+        (str, pd.DataFrame, list): The name of the file, the sheet's data and
+          the names of the columns that were skipped.
+    """
+    filename = folder_path + "/" + file
+    pattern = r'(?<=20)(\d{2})'
+    match = re.findall(pattern, file)
+    sheet = "PLNT" + match[0]
+    # adjust for different file formats before 2014
+    if int(match[0]) < 14:
+        if match[0] == "04":
+            sheet = "EGRD" + sheet
+        header = 4
+    else:
+        header = 1
+    df, skipped = read_projected_sheet(filename, sheet, header, COL_NAMES)
+    df["FILE"] = file
+    if 'YEAR' not in df.columns:
+        df['YEAR'] = '20' + match[0]
+    return file, df, skipped
+
+
+def import_PLNT_sheet_data(max_workers=EGRID_WORKERS):
     """
     This function loads the data in the Excel files from the egrid_data folder
-    and returns a json where the keys are filenames and the values are
-    corresponding jsons contain the file's data.
+    and writes the data of each file to its own Parquet file in the
+    plant_data folder. Files already parsed with the same content, code and
+    COL_NAMES are taken from the artifact cache; the others are parsed in
+    parallel across a pool of processes. The columns skipped in each file
+    are written to skipped_columns.json.
+
+    Args:
+        max_workers (int): The number of processes parsing files. None uses
+          one process per core.
     """
     folder_path = str(pathlib.Path(__file__).parent.parent.parent /
                        "data/raw_data/egrid_data")
     output_dir = pathlib.Path(__file__).parent.parent.parent / "data/intermediate_data"
-    output_file = output_dir / "plant_data.json"
-
-    # convert all plant data in each excel to pandas files in a dicitonary
-    dfs = {}
-    for file in os.listdir(folder_path):
-        filename = folder_path + "/" + file
-        pattern = r'(?<=20)(\d{2})'
-        match = re.findall(pattern, file)
-        sheet = "PLNT" + match[0]
-        # adjust for different file formats before 2014
-        if int(match[0]) < 14:
-            if match[0] == "04":
-                sheet = "EGRD" + sheet
-            df = pd.read_excel(
-                filename,
-                header=4,
-                sheet_name=sheet
-            )
-        else:
-            df = pd.read_excel(
-                filename,
-                header=1,
-                sheet_name=sheet
-            )
-        df["FILE"] = file
-        if 'YEAR' not in df.columns:
-            df['YEAR'] = '20' + match[0]
-        dfs[file] = df
-
-        # Convert each DataFrame to JSON and store in the dictionary
-        json_dataframes = {}
-        for key, df in dfs.items():
-            json_dataframes[key] = df.to_json()
-        # Write the dictionary to a JSON file
-        with open(output_file, "w") as json_file:
-            json_file.write(json.dumps(json_dataframes, indent=4))
+    plant_dir = output_dir / "plant_data"
+    skipped_file = output_dir / "skipped_columns.json"
+
+    # remove the files of a previous run so removed workbooks do not linger
+    plant_dir.mkdir(exist_ok=True)
+    for old_file in plant_dir.glob("*.parquet"):
+        old_file.unlink()
+
+    # the file name is part of the key since the year is detected from it
+    code_version = artifact_cache.code_digest(
+        read_projected_sheet, read_PLNT_sheet, write_table, arrow_safe)
+    files = os.listdir(folder_path)
+    keys = {
+        file: artifact_cache.cache_key(
+            "parsed", file, code_version, COL_NAMES,
+            artifact_cache.file_digest(folder_path + "/" + file))
+        for file in files
+    }
+
+    # reuse the files that were already parsed
+    skipped_columns = {}
+    to_parse = []
+    for file in files:
+        cached = artifact_cache.lookup(keys[file])
+        if cached is None:
+            to_parse.append(file)
+            continue
+        shutil.copyfile(cached, plant_dir / (pathlib.Path(file).stem + ".parquet"))
+        skipped_columns[file] = artifact_cache.load_metadata(keys[file])
+        print(f"{file}: unchanged, reused cached data")
+
+    # write the plant data in each new excel to its own Parquet file
+    if to_parse:
+        context = multiprocessing.get_context(PROCESS_START_METHOD)
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 mp_context=context) as executor:
+            for file, df, skipped in executor.map(
+                    read_PLNT_sheet, [folder_path] * len(to_parse), to_parse):
+                cached = artifact_cache.store_frame(keys[file], df)
+                shutil.copyfile(cached, plant_dir /
+                                (pathlib.Path(file).stem + ".parquet"))
+                artifact_cache.store_metadata(keys[file], skipped)
+                skipped_columns[file] = skipped
+                print(f"{file}: kept {df.shape[1]} columns, "
+                      f"skipped {len(skipped)}")
+
+    # drop the cached files of workbooks, code or columns no longer in use
+    artifact_cache.prune("parsed", keys.values())
+
+    # Record the columns that were not read from each file
+    with open(skipped_file, "w") as json_file:
+        json.dump(skipped_columns, json_file, indent=4)
@@ -0,0 +1,112 @@
+'''
+This file stores the pages fetched from the EIA API on disk, keyed by a
+fingerprint of the request, so that they can be revalidated with conditional
+requests instead of being downloaded again
+'''
+
+import hashlib
+import json
+import pathlib
+
+
+CACHE_DIR = (pathlib.Path(__file__).parent.parent.parent /
+             "data/intermediate_data/api_cache")
+
+# request parameters that do not change the content of a response
+IGNORED_PARAMS = {"api_key"}
+
+
+def fingerprint(url, params):
+    """
+    Computes a stable fingerprint of a request.
+
+    Args:
+        url (str): The URL of the request.
+        params (dict): The parameters of the request.
+
+    Returns:
+        str: The hex digest identifying the request.
+    """
+    key_params = {key: value for key, value in params.items()
+                  if key not in IGNORED_PARAMS}
+    key = json.dumps({"url": url, "params": key_params}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def load_entry(cache_dir, key):
+    """
+    Loads a cached page.
+
+    Args:
+        cache_dir (pathlib.Path): The directory holding the cached pages.
+        key (str): The fingerprint of the request.
+
+    Returns:
+        dict: The cache entry with the response and its validators, or None
+          if the page is not cached.
+    """
+    path = pathlib.Path(cache_dir) / f"{key}.json"
+    if not path.exists():
+        return None
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def store_entry(cache_dir, key, response, headers):
+    """
+    Stores a page with the validators the server sent for it.
+
+    Args:
+        cache_dir (pathlib.Path): The directory holding the cached pages.
+        key (str): The fingerprint of the request.
+        response (dict): The decoded JSON response of the page.
+        headers (Mapping): The headers of the HTTP response.
+    """
+    cache_dir = pathlib.Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "fingerprint": key,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "response": response
+    }
+    # write to a temporary file first so a crash never leaves a broken entry
+    tmp_path = cache_dir / f"{key}.json.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(entry, file)
+    tmp_path.replace(cache_dir / f"{key}.json")
+
+
+def conditional_headers(entry):
+    """
+    Builds the headers used to revalidate a cached page.
+
+    Args:
+        entry (dict): The cache entry, or None.
+
+    Returns:
+        dict: The If-None-Match and If-Modified-Since headers available.
+    """
+    headers = {}
+    if entry is None:
+        return headers
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def latest_period(responses):
+    """
+    Finds the most recent period contained in a list of API responses.
+
+    Args:
+        responses (list): The decoded JSON responses of the API.
+
+    Returns:
+        str: The latest period, or None if the responses hold no data.
+    """
+    periods = [record["period"] for response in responses
+               for record in response["response"]["data"]]
+    return max(periods) if periods else None
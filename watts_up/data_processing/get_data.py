@@ -1,34 +1,256 @@
 '''
-This script is used to gather, clean, and load the data into a sqlite database
+This script is used to gather, clean, and load the data into a sqlite database.
+Each step of the ETL is a stage that declares the files it reads and writes;
+stages that do not depend on each other run concurrently and stages whose
+outputs are newer than their inputs are skipped. Stages reading from outside
+the repository, like the EIA API, instead run again once their outputs are
+older than their max_age.
 Author: Jacob Trout
 '''
 
+import pathlib
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from watts_up.data_processing.extract_data.import_data import fetch_electricity_data, import_PLNT_sheet_data
 from watts_up.data_processing.clean_data.clean_data import clean_plant_data, clean_price_data, clean_gdp_data, clean_pop_data
 from watts_up.data_processing.load_data.make_db import makedb
-from watts_up.util.util import URL, PARAMS
-def run_etl():
+from watts_up.data_viz.trajectories import build_trajectories
+from watts_up.util.util import URL, PARAMS, EGRID_WORKERS, FETCH_MAX_AGE
+
+PACKAGE_DIR = pathlib.Path(__file__).parent.parent
+CODE_DIR = PACKAGE_DIR / "data_processing"
+RAW_DIR = PACKAGE_DIR / "data/raw_data"
+INTERMEDIATE_DIR = PACKAGE_DIR / "data/intermediate_data"
+FINAL_DIR = PACKAGE_DIR / "data/final_data"
+
+
+def stages(incremental=False, egrid_workers=EGRID_WORKERS):
     """
-    This function executes all the functions to complete the full etl process
-    and outputs the full SQLite3 database 'plants.db'
+    Declares the stages of the ETL process. The code of a stage is one of its
+    inputs, so editing it rebuilds the stage and everything downstream.
+
+    Args:
+        incremental (bool): If True, only price data newer than the data
+          already fetched is requested from the API.
+        egrid_workers (int): The number of processes parsing eGRID files.
+
+    Returns:
+        dict: Maps each stage name to its function, inputs and outputs.
+    """
+    clean_code = CODE_DIR / "clean_data/clean_data.py"
+    # the modules the eGRID stages and their artifact cache are built with
+    egrid_code = [CODE_DIR / "columnar.py", CODE_DIR / "artifact_cache.py",
+                  PACKAGE_DIR / "util/util.py"]
+    return {
+        "fetch": {
+            "run": lambda: fetch_electricity_data(URL, PARAMS,
+                                                  incremental=incremental),
+            "inputs": [],
+            "max_age": FETCH_MAX_AGE,
+            "outputs": [INTERMEDIATE_DIR / "api_responses.json"],
+            "message": "scraping electricity data completed",
+        },
+        "ingest": {
+            "run": lambda: import_PLNT_sheet_data(egrid_workers),
+            "inputs": [RAW_DIR / "egrid_data",
+                       CODE_DIR / "extract_data/import_data.py",
+                       *egrid_code],
+            "outputs": [INTERMEDIATE_DIR / "plant_data"],
+            "message": "ingest plant data completed",
+        },
+        "clean_plants": {
+            "run": clean_plant_data,
+            "inputs": [INTERMEDIATE_DIR / "plant_data", clean_code,
+                       CODE_DIR / "load_data/schema.py", *egrid_code],
+            "outputs": [FINAL_DIR / "cleaned_egrid_data.parquet"],
+            "message": "plant data cleaning completed",
+        },
+        "clean_price": {
+            "run": clean_price_data,
+            "inputs": [INTERMEDIATE_DIR / "api_responses.json", clean_code],
+            "outputs": [FINAL_DIR / "cleaned_api_responses.parquet"],
+            "message": "price data cleaning completed",
+        },
+        "clean_gdp": {
+            "run": clean_gdp_data,
+            "inputs": [RAW_DIR / "gdp_pop/gdp.csv", clean_code],
+            "outputs": [FINAL_DIR / "gdp_numbers.parquet"],
+            "message": "gdp data cleaning completed",
+        },
+        "clean_pop": {
+            "run": clean_pop_data,
+            "inputs": [RAW_DIR / "gdp_pop/p1.csv", RAW_DIR / "gdp_pop/p2.csv",
+                       clean_code],
+            "outputs": [FINAL_DIR / "pop_numbers.parquet"],
+            "message": "population data cleaning completed",
+        },
+        "trajectories": {
+            "run": build_trajectories,
+            "inputs": [FINAL_DIR / "cleaned_egrid_data.parquet",
+                       PACKAGE_DIR / "data_viz/trajectories.py",
+                       PACKAGE_DIR / "data_viz/regression_predict.py",
+                       PACKAGE_DIR / "util/util.py"],
+            "outputs": [FINAL_DIR / "trajectories.parquet"],
+            "message": "trajectory models fitted",
+        },
+        "makedb": {
+            "run": makedb,
+            "inputs": [FINAL_DIR / "cleaned_egrid_data.parquet",
+                       FINAL_DIR / "cleaned_api_responses.parquet",
+                       FINAL_DIR / "gdp_numbers.parquet",
+                       FINAL_DIR / "pop_numbers.parquet",
+                       FINAL_DIR / "trajectories.parquet",
+                       CODE_DIR / "load_data",
+                       PACKAGE_DIR / "data_viz/helper.py",
+                       PACKAGE_DIR / "data_viz/queries.py",
+                       PACKAGE_DIR / "data_viz/regression_predict.py",
+                       PACKAGE_DIR / "util/util.py"],
+            "outputs": [FINAL_DIR / "plants.db"],
+            "message": "database created",
+        },
+    }
+
+
+def expand(paths):
+    """
+    Lists the files behind a list of paths, replacing directories with the
+    files and subdirectories they contain. Directories are kept since their
+    modification time changes when a file is removed from them.
+
+    Args:
+        paths (list): File and directory paths.
+
+    Returns:
+        list: The file and directory paths. Missing paths are returned as is.
+    """
+    files = []
+    for path in paths:
+        if path.is_dir():
+            files.append(path)
+            files += [p for p in path.rglob("*")
+                      if "__pycache__" not in p.parts]
+        else:
+            files.append(path)
+    return files
+
+
+def is_up_to_date(stage, now=None):
+    """
+    Checks whether all outputs of a stage exist and are newer than its inputs
+    and, for a stage with a max_age, younger than it.
+
+    Args:
+        stage (dict): The stage declaration.
+        now (float): The current time, as a timestamp. None uses the clock.
+
+    Returns:
+        bool: True if the stage can be skipped.
+    """
+    outputs = expand(stage["outputs"])
+    if not outputs or not all(path.exists() for path in outputs):
+        return False
+    if "max_age" in stage:
+        now = time.time() if now is None else now
+        oldest_output = min(path.stat().st_mtime for path in outputs)
+        if now - oldest_output > stage["max_age"]:
+            return False
+    inputs = [path for path in expand(stage["inputs"]) if path.exists()]
+    if not inputs:
+        return True
+    oldest_output = min(path.stat().st_mtime for path in outputs)
+    newest_input = max(path.stat().st_mtime for path in inputs)
+    return oldest_output > newest_input
+
+
+def dependencies(all_stages):
+    """
+    Derives the dependencies between stages: a stage depends on every stage
+    producing one of its inputs.
+
+    Args:
+        all_stages (dict): The stage declarations.
+
+    Returns:
+        dict: Maps each stage name to the set of stages it depends on.
+    """
+    def overlaps(a, b):
+        return a == b or a in b.parents or b in a.parents
+
+    deps = {}
+    for name, stage in all_stages.items():
+        deps[name] = {
+            other for other, other_stage in all_stages.items()
+            if other != name and any(overlaps(i, o) for i in stage["inputs"]
+                                     for o in other_stage["outputs"])
+        }
+    return deps
+
+
+def select(deps, targets):
     """
-    url,params = URL, PARAMS
-    # Import Data
-    fetch_electricity_data(url,params)
-    print("scraping electricity data completed")
-    import_PLNT_sheet_data()
-    print("ingest plant data completed")
+    Selects the target stages and every stage they depend on.
 
-    # Clean Data
-    clean_plant_data()
-    clean_price_data()
-    clean_gdp_data()
-    clean_pop_data()
-    print("data cleaning completed")
+    Args:
+        deps (dict): The dependencies of each stage.
+        targets (list): The names of the target stages.
 
-    # Load Database
-    makedb()
-    print("database created")
+    Returns:
+        set: The names of the selected stages.
+    """
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in deps:
+            raise ValueError(f"Unknown stage: {name}. "
+                             f"Stages are: {', '.join(deps)}")
+        if name not in selected:
+            selected.add(name)
+            pending += deps[name]
+    return selected
 
 
+def run_etl(targets=None, jobs=4, force=False, incremental=False,
+            egrid_workers=EGRID_WORKERS):
+    """
+    This function executes all the functions to complete the full etl process
+    and outputs the full SQLite3 database 'plants.db'
+
+    Args:
+        targets (list): The stages to build, along with the stages they
+          depend on. None builds every stage.
+        jobs (int): The maximum number of stages running at once.
+        force (bool): If True, the target stages run even if up to date.
+          The stages they depend on still only run if out of date.
+        incremental (bool): If True, only price data newer than the data
+          already fetched is requested from the API.
+        egrid_workers (int): The number of processes parsing eGRID files.
+    """
+    all_stages = stages(incremental, egrid_workers)
+    deps = dependencies(all_stages)
+    targets = targets or list(all_stages)
+    selected = select(deps, targets)
+    forced = set(targets) if force else set()
+    done = set()
+    running = {}
+
+    def run_stage(name):
+        stage = all_stages[name]
+        # an incremental fetch always asks the API for new data
+        if (name not in forced and not (incremental and name == "fetch")
+                and is_up_to_date(stage)):
+            print(f"{name} is up to date, skipping")
+            return
+        stage["run"]()
+        print(stage["message"])
 
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while len(done) < len(selected):
+            for name in selected - done - set(running.values()):
+                if deps[name] & selected <= done:
+                    running[executor.submit(run_stage, name)] = name
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                # re-raises the exception of a failed stage
+                future.result()
+                done.add(running.pop(future))
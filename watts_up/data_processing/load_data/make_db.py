@@ -2,75 +2,143 @@
 This file creates the database
 Authors: Jacob Trout and and Praveen Devarajan 
 """
+import os
 import sqlite3
 import pathlib
-import json
-from watts_up.data_processing.load_data.schema import schema
+from watts_up.data_processing.columnar import read_table, iter_table
+from watts_up.data_processing.load_data.schema import schema, indexes
+from watts_up.data_processing.load_data.summaries import build_summaries
+from watts_up.data_viz.helper import label_plant_types
+from watts_up.data_viz.queries import QUERIES
+from watts_up.util.util import PLANT_CHUNK_SIZE
 
 OUTPUT_DIR = (pathlib.Path(__file__).parent.parent.parent / "data/final_data")
 
+# settings used while loading: the database is rebuilt from scratch
+LOAD_PRAGMAS = """
+    PRAGMA journal_mode = OFF;
+    PRAGMA synchronous = OFF;
+    PRAGMA locking_mode = EXCLUSIVE;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA cache_size = -200000;
+"""
+
+def insert_frames(conn, table, frames):
+    """
+    Inserts DataFrames into a table with executemany. Values are bound to
+    the table columns by name, so the order of the DataFrame columns does
+    not matter.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        table (str): The name of the table.
+        frames (iterable): The DataFrames holding the rows to insert.
+    """
+    for df in frames:
+        columns = ", ".join(df.columns)
+        placeholders = ", ".join("?" * len(df.columns))
+        insert_query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+        conn.executemany(insert_query, df.itertuples(index=False, name=None))
+
+
+def unindexed_scans(conn, query):
+    """
+    Lists the full table scans in the query plan of a query.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        query (str): The SQL query.
+
+    Returns:
+        list: The steps of the plan scanning a table without an index.
+    """
+    plan = conn.execute("EXPLAIN QUERY PLAN " + query).fetchall()
+    # the last column of each row describes the step, e.g. "SCAN plants";
+    # scans of intermediate results read "SCAN (subquery-1)"
+    return [row[-1] for row in plan
+            if row[-1].startswith("SCAN ") and "INDEX" not in row[-1]
+            and not row[-1].startswith("SCAN (")]
+
+
+def check_query_plans(conn):
+    """
+    Checks with EXPLAIN QUERY PLAN that every query run by the pages is
+    served by an index.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+
+    Raises:
+        RuntimeError: If a query scans a table without an index.
+    """
+    failures = {name: unindexed_scans(conn, query)
+                for name, query in QUERIES.items()}
+    failures = {name: scans for name, scans in failures.items() if scans}
+    if failures:
+        raise RuntimeError(f"Queries not served by an index: {failures}")
+
+
 def makedb():
     """ 
     This function creates the Plants.db. Pulls all the cleaned versions of the 
-    relevant data and compiles them in the database.
+    relevant data and compiles them in the database. The database is built in
+    a temporary file that replaces plants.db only once it is complete, so
+    readers never see a partially built database.
     """
+    path = pathlib.Path(OUTPUT_DIR, "plants.db")
+    tmp_path = pathlib.Path(OUTPUT_DIR, "plants.db.tmp")
+    tmp_path.unlink(missing_ok=True)
 
-    # save folder path to output directory as string
-    folder_path = str(OUTPUT_DIR) + "/"
-
-    # remove database if it exists already
-    path = pathlib.Path(OUTPUT_DIR,"plants.db")
-    path.unlink()
     # connect to fresh database & create tables
-    conn = sqlite3.connect(path)
-    c = conn.cursor()
-    c.executescript(schema())
-
-    # Plant Table
-    with open(folder_path + "cleaned_egrid_data.json", "r") as f:
-        data = json.load(f)
-        for entry in data:
-            insert_query = '''
-                INSERT INTO plants VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,
-                ?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            '''
-            # Insert data into the table
-            c.execute(insert_query, tuple(entry[key] for key in entry.keys()))
-    print("finished plant table")
-
-    # Elec Table
-    with open(folder_path + "cleaned_api_responses.json", "r") as f:
-        data = json.load(f)
-        for entry in data:
-            insert_query = '''
-                INSERT INTO elec_table VALUES (?,?,?,?,?,?,?)
-            '''
-            # Insert data into the table
-            c.execute(insert_query, tuple(entry[key] for key in entry.keys()))
-    print("finished price table")
-
-    # POP table
-    with open(folder_path + "pop_numbers.json", "r") as f:
-        data = json.load(f)
-        for entry in data:
-            insert_query = '''
-                INSERT INTO pop_table VALUES (?,?,?,?)
-            '''
-            # Insert data into the table
-            c.execute(insert_query, tuple(entry[key] for key in entry.keys()))
-    print("finished pop table")
-
-    # GDP TABLE
-    with open(folder_path + "gdp_numbers.json", "r") as f:
-        data = json.load(f)
-        for entry in data:
-            insert_query = '''
-                INSERT INTO gdp_table VALUES (?,?,?,?)
-            '''
-            # Insert data into the table
-            c.execute(insert_query, tuple(entry[key] for key in entry.keys()))
-    print("finished gdp table")
-
-    # Commit transaction and close connection
-    conn.commit()
+    conn = sqlite3.connect(tmp_path)
+    try:
+        # nothing needs to survive a crash: a failed build is thrown away
+        conn.executescript(LOAD_PRAGMAS)
+        conn.executescript(schema())
+
+        # Plant Table, streamed in chunks to bound memory use and labeled
+        # with the plant types shown by the pages
+        chunks = iter_table(OUTPUT_DIR / "cleaned_egrid_data.parquet",
+                            PLANT_CHUNK_SIZE)
+        insert_frames(conn, "plants",
+                      (label_plant_types(chunk) for chunk in chunks))
+        print("finished plant table")
+
+        # Elec Table
+        insert_frames(conn, "elec_table",
+                      [read_table(OUTPUT_DIR / "cleaned_api_responses.parquet")])
+        print("finished price table")
+
+        # POP table
+        insert_frames(conn, "pop_table",
+                      [read_table(OUTPUT_DIR / "pop_numbers.parquet")])
+        print("finished pop table")
+
+        # GDP TABLE
+        insert_frames(conn, "gdp_table",
+                      [read_table(OUTPUT_DIR / "gdp_numbers.parquet")])
+        print("finished gdp table")
+
+        # Trajectories of the renewable share, fitted by their own stage
+        insert_frames(conn, "trajectories",
+                      [read_table(OUTPUT_DIR / "trajectories.parquet")])
+        print("finished trajectories table")
+
+        # building the indexes once is faster than updating them per row
+        conn.executescript(indexes())
+        conn.execute("ANALYZE")
+        conn.commit()
+        check_query_plans(conn)
+
+        # precompute what the pages show
+        build_summaries(conn)
+        conn.commit()
+        print("finished summary tables")
+    except BaseException:
+        conn.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
     conn.close()
+
+    # atomically replace the previous database
+    os.replace(tmp_path, path)
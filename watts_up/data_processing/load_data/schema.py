@@ -2,61 +2,72 @@
 This file contains the definition for the database schema
 Authors: Jacob Trout and Praveen Chandar
 """
+from watts_up.util.util import PLANT_TYPE_COLUMNS
+
+# columns of the plants table and their types, in table order
+PLANT_COLUMNS = {
+    "year": "INTEGER",
+    "year_state": "TEXT",
+    "state_id": "TEXT",
+    "pname": "TEXT",
+    "orispl": "INT",
+    "oprname": "TEXT",
+    "oprcode": "REAL",
+    "utlsrvnm": "TEXT",
+    "utlsrvid": "INT",
+    "nerc": "TEXT",
+    "subrgn": "TEXT",
+    "srname": "TEXT",
+    "fipsst": "INTEGER",
+    "fipscnty": "INT",
+    "cntyname": "TEXT",
+    "lat": "REAL",
+    "lon": "REAL",
+    "plprmfl": "TEXT",
+    "plfuelct": "TEXT",
+    "plpfgnct": "TEXT",
+    "coalflag": "INT",
+    "capfac": "REAL",
+    "namepcap": "REAL",
+    "plngenan": "REAL",
+    "plco2an": "REAL",
+    "plgenacl": "REAL",
+    "plgenaol": "REAL",
+    "plgenags": "REAL",
+    "plgenanc": "REAL",
+    "plgenahy": "REAL",
+    "plgenabm": "REAL",
+    "plgenawi": "REAL",
+    "plgenaso": "REAL",
+    "plgenagt": "REAL",
+    "plgenaof": "REAL",
+    "plgenaop": "REAL",
+    "plgenatn": "REAL",
+    "plgenatr": "REAL",
+    "plgenath": "REAL",
+    "plgenacy": "REAL",
+    "plgenacn": "REAL",
+    "file": "TEXT",
+    "sector": "TEXT",
+    "nbfactor": "REAL"
+}
+
 
 def schema():
     """ Return current version of schema. """
+    # the plant type labels are added to the cleaned columns by makedb
+    plant_columns = ",\n        ".join(
+        [f"{col} {col_type}" for col, col_type in PLANT_COLUMNS.items()] +
+        [f"{col} TEXT" for col in PLANT_TYPE_COLUMNS.values()])
     
-    return """
+    return f"""
     CREATE TABLE plants (
-        year INTEGER,
-        year_state TEXT,
-        state_id TEXT,
-        pname TEXT,
-        orispl INT,
-        oprname TEXT,
-        oprcode REAL,
-        utlsrvnm TEXT,
-        utlsrvid INT,
-        nerc TEXT,
-        subrgn TEXT,
-        srname TEXT,
-        fipsst INTEGER,
-        fipscnty INT,
-        cntyname TEXT,
-        lat REAL,
-        lon REAL,
-        plprmfl TEXT,
-        plfuelct TEXT,
-        plpfgnct TEXT,
-        coalflag INT,
-        capfac REAL,
-        namepcap REAL,
-        plngenan REAL,
-        plco2an REAL,
-        plgenacl REAL,
-        plgenaol REAL,
-        plgenags REAL,
-        plgenanc REAL,
-        plgenahy REAL,
-        plgenabm REAL,
-        plgenawi REAL,
-        plgenaso REAL,
-        plgenagt REAL,
-        plgenaof REAL,
-        plgenaop REAL,
-        plgenatn REAL,
-        plgenatr REAL,
-        plgenath REAL,
-        plgenacy REAL,
-        plgenacn REAL,
-        file TEXT,
-        sector TEXT,
-        nbfactor REAL
+        {plant_columns}
         );
     CREATE TABLE elec_table (
         stateid TEXT,
         year INTEGER,
-        year_state TEXT PRIMARY KEY,
+        year_state TEXT,
         price_all REAL,
         price_com REAL,
         price_ind REAL,
@@ -66,13 +77,112 @@ def schema():
         year INTEGER,
         population INT,
         stateid TEXT,
-        year_state TEXT PRIMARY KEY
+        year_state TEXT
     );
     CREATE TABLE gdp_table (
         year INTEGER,
         gdp_2022_prices INT,
         stateid TEXT,
-        year_state TEXT PRIMARY KEY
+        year_state TEXT
+    );
+    CREATE TABLE state_year_summary (
+        year INTEGER,
+        state_id TEXT,
+        total_energy REAL,
+        non_renewable_energy REAL,
+        renewable_energy REAL,
+        carbon_emission REAL
+    );
+    CREATE TABLE price_summary (
+        year INTEGER,
+        stateid TEXT,
+        total_average_price REAL,
+        commercial_price REAL,
+        indusrial_price REAL,
+        residential_price REAL
+    );
+    CREATE TABLE fuel_year_summary (
+        year INTEGER,
+        Coal REAL,
+        Gas REAL,
+        Nuclear REAL,
+        Wind REAL,
+        Solar REAL,
+        Other REAL
+    );
+    CREATE TABLE plant_type_generation (
+        year INTEGER,
+        plant_type TEXT,
+        total_generation_plant_type REAL,
+        percentage REAL
+    );
+    CREATE TABLE plant_type_counts (
+        year INTEGER,
+        state_id TEXT,
+        plant_type TEXT,
+        count INTEGER
+    );
+    CREATE TABLE trajectories (
+        state_id TEXT,
+        model TEXT,
+        year INTEGER,
+        estimate REAL,
+        lower REAL,
+        upper REAL
+    );
+    CREATE TABLE projections (
+        target INTEGER,
+        state_id TEXT,
+        predicted_year INTEGER,
+        outcome TEXT,
+        statistically_significant TEXT
     );
 
-    """
\ No newline at end of file
+    """
+
+
+def indexes():
+    """
+    Return the indexes, created once the tables are loaded. Besides the
+    lookup indexes, the covering indexes hold every column the page queries
+    in watts_up/data_viz/queries.py read, so they never touch the table.
+    """
+
+    return """
+    CREATE INDEX plants_orispl ON plants (orispl);
+    CREATE INDEX plants_pname ON plants (pname);
+    CREATE INDEX plants_year_state_sums ON plants (
+        year_state, year, state_id, plfuelct,
+        plngenan, plgenatn, plgenatr, plco2an);
+    CREATE INDEX plants_year_sums ON plants (
+        year, state_id, plngenan, plgenatn, plgenatr, plco2an);
+    CREATE INDEX plants_fuel_generation ON plants (
+        year, plgenacl, plgenags, plgenanc, plgenawi, plgenaso,
+        plgenaol, plgenagt, plgenabm, plgenaof, plgenahy, plgenaop);
+    CREATE INDEX plants_plant_type ON plants (year, plant_type);
+    CREATE INDEX plants_trend_plant_type ON plants (
+        year, trend_plant_type, state_id, plgenatn, plgenatr);
+    CREATE INDEX elec_year_prices ON elec_table (
+        year, stateid, price_all, price_com, price_ind, price_res);
+    CREATE UNIQUE INDEX elec_year_state ON elec_table (year_state);
+    CREATE UNIQUE INDEX pop_year_state ON pop_table (year_state);
+    CREATE UNIQUE INDEX gdp_year_state ON gdp_table (year_state);
+    """
+
+
+def summary_indexes():
+    """ Return the indexes of the summary tables, created once they are built. """
+
+    return """
+    CREATE INDEX state_year_summary_key ON state_year_summary (year, state_id);
+    CREATE INDEX price_summary_key ON price_summary (year, stateid);
+    CREATE INDEX fuel_year_summary_key ON fuel_year_summary (year);
+    CREATE INDEX plant_type_generation_key ON plant_type_generation (
+        year, plant_type);
+    CREATE INDEX plant_type_counts_key ON plant_type_counts (
+        year, state_id, plant_type);
+    CREATE INDEX trajectories_state ON trajectories (
+        state_id, model, year, estimate, lower, upper);
+    CREATE INDEX projections_target ON projections (
+        target, state_id, predicted_year, outcome, statistically_significant);
+    """
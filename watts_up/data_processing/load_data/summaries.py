@@ -0,0 +1,47 @@
+"""
+This file builds the summary tables read by the dashboard pages, so the pages
+never aggregate the plants table or fit models themselves
+"""
+import pandas as pd
+from watts_up.data_viz.queries import (PLANTS_BY_STATE_YEAR,
+    PRICE_BY_STATE_YEAR, FUEL_BY_YEAR, GENERATION_BY_PLANT_TYPE,
+    COUNTS_BY_PLANT_TYPE, TOTAL_GENERATION)
+from watts_up.data_viz.regression_predict import (prediction_data_prep,
+    project_targets)
+from watts_up.data_processing.load_data.schema import summary_indexes
+from watts_up.util.util import PROJECTION_TARGETS
+
+
+def build_summaries(conn):
+    """
+    Builds the summary tables from the loaded plants and elec tables.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+    """
+    conn.execute("INSERT INTO state_year_summary " + PLANTS_BY_STATE_YEAR)
+    conn.execute("INSERT INTO price_summary " + PRICE_BY_STATE_YEAR)
+    conn.execute("INSERT INTO fuel_year_summary " + FUEL_BY_YEAR)
+    conn.execute("INSERT INTO plant_type_generation " +
+                 GENERATION_BY_PLANT_TYPE)
+    conn.execute("INSERT INTO plant_type_counts " + COUNTS_BY_PLANT_TYPE)
+    build_projections(conn)
+
+    conn.executescript(summary_indexes())
+
+
+def build_projections(conn):
+    """
+    Predicts when each state reaches every target share of renewable energy
+    in PROJECTION_TARGETS and stores the predictions in the projections table.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+    """
+    data = prediction_data_prep(pd.read_sql_query(TOTAL_GENERATION, conn))
+    projections = project_targets(data, PROJECTION_TARGETS)
+    projections['target'] = projections['target'].astype(int)
+    conn.executemany(
+        "INSERT INTO projections VALUES (?, ?, ?, ?, ?)",
+        projections.astype(object).where(projections.notna(), None)
+        .itertuples(index=False, name=None))
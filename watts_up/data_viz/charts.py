@@ -1,11 +1,13 @@
 """
-Helper scripts for creating treemap and line chart for the trends page.
+Helper scripts for creating treemap and line chart for the trends page, and
+the trajectory chart of the predict page.
 
 Author:
 Praveen Chandar Devarajan
 """
 
 import plotly.express as px
+import plotly.graph_objects as go
 
 def create_line_chart(counts, plant_typesplotting):
     """
@@ -48,21 +50,19 @@ def create_line_chart(counts, plant_typesplotting):
 
     return fig
 
-def create_treemap(raw_df, plant_type, year):
+def create_treemap(grouped_data, plant_type, year):
     """
-    Create a treemap. This function also performs some basic data grouping.
+    Create a treemap. This function doesnt group the data.
 
     Inputs:
-        raw_df (pd.DataFrame): Input DataFrame.
+        grouped_data (pd.DataFrame): DataFrame with the number of plants
+        ('count') per year, state_id and plant_type.
         plant_type (str): Plant type for filtering.
         year (int): Year for filtering.
 
     Returns:
         Treemap figure.
     """
-    grouped_data = raw_df.groupby(['year', 'state_id', 'plant_type']).size()\
-        .reset_index(name='count')
-    
     # Filter data for the specified plant_type and year
     given_typedf = grouped_data[(grouped_data['plant_type'] == plant_type)\
                                  & (grouped_data['year'] == year)]
@@ -88,4 +88,49 @@ def create_treemap(raw_df, plant_type, year):
         margin=dict(l=0, r=0, b=0, t=100),  
     )
 
-    return fig
\ No newline at end of file
+    return fig
+
+TRAJECTORY_MODELS = {'logistic': ('Logistic', 'green'),
+                     'holt': ('Damped Holt trend', 'darkorange')}
+
+def create_trajectory_chart(trajectories, state):
+    """
+    Create a line chart of the observed renewable share of a state and of
+    the trajectory of each model, with its confidence interval as a band.
+
+    Inputs:
+        trajectories (pd.DataFrame): The model, year, estimate, lower and
+        upper columns of the state, as stored in the trajectories table.
+        state (str): The state shown.
+
+    Returns:
+        Line chart figure.
+    """
+    fig = go.Figure()
+    for model, (name, color) in TRAJECTORY_MODELS.items():
+        df = trajectories[trajectories['model'] == model]
+        if df.empty:
+            continue
+        # the band goes along the upper bound and back along the lower one
+        fig.add_trace(go.Scatter(
+            x=list(df['year']) + list(df['year'])[::-1],
+            y=list(df['upper']) + list(df['lower'])[::-1],
+            fill='toself', fillcolor=color, opacity=0.2, line=dict(width=0),
+            hoverinfo='skip', showlegend=False, legendgroup=model))
+        fig.add_trace(go.Scatter(x=df['year'], y=df['estimate'], name=name,
+                                 line=dict(color=color), legendgroup=model))
+
+    observed = trajectories[trajectories['model'] == 'observed']
+    fig.add_trace(go.Scatter(x=observed['year'], y=observed['estimate'],
+                             mode='markers', name='Observed',
+                             marker=dict(color='black')))
+
+    fig.update_layout(title=f'Renewable Energy Share Trajectories in {state}',
+                      xaxis_title='Year',
+                      yaxis_title='Percentage (%) of the total energy mix',
+                      yaxis=dict(range=[0, 100], showgrid=True,
+                                 gridcolor='lightgrey'),
+                      xaxis=dict(showline=True, showgrid=False,
+                                 linecolor='black'),
+                      plot_bgcolor='white')
+    return fig
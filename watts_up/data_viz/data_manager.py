@@ -1,13 +1,138 @@
 '''Loads, preprocesses, and categorizes energy production data from a database, to
 ensures that the data is consistently processed and categorized across the project.
 
+The data of each page is loaded the first time it is needed rather than when
+the page is imported, and then kept until plants.db is rebuilt. The figures
+returned by the callbacks are kept in bounded caches, so repeated selections
+are not rendered again.
+
 Author: Frank Vasquez
 
 '''
 
-from watts_up.data_viz.helper import load_and_preprocess_data, plant_type
-from watts_up.util.util import  WANTED_COLUMNS
+import collections
+import functools
+import json
+import threading
+from watts_up.data_viz.db import data_version
+from watts_up.data_viz.helper import load_and_preprocess_data, build_plant_index
+from watts_up.util.util import FIGURE_CACHE_SIZE
+
+# every function decorated with cached_loader, in definition order
+LOADERS = []
+
+
+def cached_loader(function):
+    '''
+    Decorates a function taking no arguments so it runs on its first call
+    only; later calls return the same result until plants.db is rebuilt.
+    Concurrent first calls wait for a single run instead of loading the data
+    twice.
+    '''
+    lock = threading.Lock()
+    # the data version and the result it was loaded from
+    cached = [None, None]
+
+    @functools.wraps(function)
+    def loader():
+        version = data_version()
+        if cached[0] != version:
+            with lock:
+                if cached[0] != version:
+                    cached[1] = function()
+                    cached[0] = version
+        return cached[1]
+
+    LOADERS.append(loader)
+    return loader
+
+
+def figure_cache(maxsize=FIGURE_CACHE_SIZE):
+    '''
+    Decorates a callback so its outputs are kept for the inputs it has seen,
+    along with the version of the data they were computed from. The least
+    recently used outputs are dropped beyond maxsize entries.
+
+    The hit and miss counts are returned by the cache_info attribute of the
+    decorated function.
+
+    Parameters:
+    - maxsize: The maximum number of outputs kept.
+    '''
+    def decorator(function):
+        lock = threading.Lock()
+        entries = collections.OrderedDict()
+        stats = {"hits": 0, "misses": 0}
+
+        @functools.wraps(function)
+        def cached(*args):
+            # dropdown values may be lists, which are not hashable
+            key = (data_version(), json.dumps(args, sort_keys=True, default=str))
+            with lock:
+                if key in entries:
+                    entries.move_to_end(key)
+                    stats["hits"] += 1
+                    return entries[key]
+                stats["misses"] += 1
+            output = function(*args)
+            with lock:
+                entries[key] = output
+                entries.move_to_end(key)
+                while len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return output
+
+        def cache_info():
+            with lock:
+                return dict(stats, size=len(entries), maxsize=maxsize)
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+                stats.update(hits=0, misses=0)
+
+        cached.cache_info = cache_info
+        cached.cache_clear = cache_clear
+        return cached
+    return decorator
+
+
+def warm_up(background=True):
+    '''
+    Runs every registered loader, so the first visitor of each page does not
+    wait for its data.
+
+    Parameters:
+    - background: If True, the loaders run in a daemon thread and the
+      function returns immediately.
+    '''
+    def run_loaders():
+        for loader in list(LOADERS):
+            loader()
+
+    if background:
+        threading.Thread(target=run_loaders, name="warm-up", daemon=True).start()
+    else:
+        run_loaders()
+
+
+@cached_loader
+def get_plant_data():
+    '''
+    Returns:
+    - df_from_db: The plants table, with the plant_type column computed when
+      the database is built.
+    - unique_years (list): The years of the data, sorted in ascending order.
+    '''
+    return load_and_preprocess_data("plants")
+
 
-# Load and preprocess the data once, making it globally accessible
-df_from_db, unique_years = load_and_preprocess_data("plants")
-df_from_db = plant_type(df_from_db, WANTED_COLUMNS)
\ No newline at end of file
+@cached_loader
+def get_plant_index():
+    '''
+    Returns:
+    - plant_index (dict): The capacity and plant type of each plant and
+      year, and the name and location of each plant, keyed by orispl.
+    '''
+    df_from_db, _ = get_plant_data()
+    return build_plant_index(df_from_db)
@@ -0,0 +1,120 @@
+'''
+Read-only access to plants.db for the dashboard. Each thread gets its own
+connection, opened on first use and reused for every later query, so the
+pages can be served by several threads without sharing a connection.
+
+Author: Frank Vasquez
+'''
+
+import os
+import pathlib
+import sqlite3
+import threading
+import pandas as pd
+
+DB_PATH = pathlib.Path(__file__).parent.parent / "data/final_data/plants.db"
+
+# settings of the read connections: the database is never written by the
+# dashboard, so it is memory mapped and each connection keeps a page cache
+READ_PRAGMAS = """
+    PRAGMA query_only = ON;
+    PRAGMA mmap_size = 268435456;
+    PRAGMA cache_size = -65536;
+    PRAGMA temp_store = MEMORY;
+"""
+
+# prepared statements kept by each connection
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_connections = []
+_lock = threading.Lock()
+
+
+def connect(path=DB_PATH):
+    '''
+    Opens a read-only connection to the database.
+
+    Parameters:
+    - path: The path of the SQLite database.
+
+    Returns:
+    - conn: The sqlite3 connection.
+    '''
+    conn = sqlite3.connect(f"{pathlib.Path(path).resolve().as_uri()}?mode=ro",
+                           uri=True, check_same_thread=False,
+                           cached_statements=CACHED_STATEMENTS)
+    conn.executescript(READ_PRAGMAS)
+    return conn
+
+
+def get_connection():
+    '''
+    Returns the connection of the calling thread, opening it on first use.
+    The connection is reopened when plants.db has been rebuilt since, as the
+    ETL swaps in a new file rather than writing to the old one, or when it
+    was closed by close_connections.
+
+    Returns:
+    - conn: The sqlite3 connection of the calling thread.
+    '''
+    inode = data_version()[0]
+    conn = getattr(_local, "conn", None)
+    if conn is not None and (_local.inode != inode
+                             or conn not in _connections):
+        _forget(conn)
+        conn = None
+    if conn is None:
+        conn = connect(DB_PATH)
+        _local.conn, _local.inode = conn, inode
+        with _lock:
+            _connections.append(conn)
+    return conn
+
+
+def _forget(conn):
+    with _lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    conn.close()
+
+
+def close_connections():
+    '''
+    Closes the connections of every thread. Threads open a new connection
+    on their next query, e.g. in a process forked after the data was loaded.
+    '''
+    with _lock:
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            pass
+
+
+def data_version():
+    '''
+    Identifies the current build of plants.db: it changes whenever the ETL
+    swaps in a rebuilt database.
+
+    Returns:
+    - version (tuple): The inode and modification time of the database.
+    '''
+    stat = os.stat(DB_PATH)
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def query_df(query, params=None):
+    '''
+    Runs a query on the connection of the calling thread.
+
+    Parameters:
+    - query: The SQL query, with ? or :name placeholders for the parameters.
+    - params: The values bound to the placeholders, if any.
+
+    Returns:
+    - df: The result of the query as a Pandas DataFrame.
+    '''
+    return pd.read_sql_query(query, get_connection(), params=params)
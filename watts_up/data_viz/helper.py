@@ -5,9 +5,29 @@ This script contains functions designed to facilitate data processing tasks,
 Author: Praveen Chandar Devarajan and Frank Vasquez
 '''
 
-import sqlite3
 import numpy as np
 import pandas as pd
+from watts_up.data_viz.db import query_df
+from watts_up.util.util import PLANT_TAXONOMIES, PLANT_TYPE_COLUMNS
+
+def add_other_sources(df):
+    '''
+    Adds the 'other_sources' column: the generation of the sources not
+    shown separately, with missing values counted as 0.
+    '''
+    df['other_sources'] = df[['plgenaol', 'plgenagt', 'plgenabm', 'plgenaof', 'plgenahy', 'plgenaop']].sum(axis=1)
+    return df
+
+def label_plant_types(df):
+    '''
+    Adds a plant type column for each of the PLANT_TAXONOMIES, named as in
+    PLANT_TYPE_COLUMNS, to plant data with the generation columns.
+    '''
+    with_other = add_other_sources(df.copy())
+    for name, wanted_columns in PLANT_TAXONOMIES.items():
+        df[PLANT_TYPE_COLUMNS[name]] = classify_plant_types(with_other,
+                                                            wanted_columns)
+    return df
 
 def load_and_preprocess_data(table_name):
     '''
@@ -18,12 +38,9 @@ def load_and_preprocess_data(table_name):
     - df:  The preprocessed Pandas DataFrame containing the energy production data.
     - unique_years (list): A list of unique years sorted in ascending order, extracted from the data.
     '''
-    conn = sqlite3.connect('watts_up/data/final_data/plants.db')
-    query = f"SELECT * FROM {table_name}"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    df = query_df(f"SELECT * FROM {table_name}")
 
-    df['other_sources'] = df[['plgenaol', 'plgenagt', 'plgenabm', 'plgenaof', 'plgenahy', 'plgenaop']].sum(axis=1)
+    df = add_other_sources(df)
     df['total_gen_capacity'] = df['plgenacl'] + df['plgenags'] + df['plgenanc'] + df['plgenawi'] + df['plgenaso'] + df['other_sources']
     df['year'] = pd.to_numeric(df['year'], errors='coerce')
     df['total_gen_capacity'] = pd.to_numeric(df['total_gen_capacity'], errors='coerce')
@@ -32,67 +49,79 @@ def load_and_preprocess_data(table_name):
 
     return df, unique_years
 
-def plant_type(df, wanted_columns):
+def load_summary(query):
+    '''
+    Parameters:
+    - query: The query reading one of the summary tables built with the database.
+
+    Returns:
+    - df: The Pandas DataFrame containing the summary table.
+    '''
+    return query_df(query)
+
+def classify_plant_types(df, wanted_columns):
     """
-    Assigns a plant type to each row in the DataFrame based on the maximum generating capacity.
-    
+    Labels each row with the plant type of its largest generation column.
+    Ties go to the first column in wanted_columns, as with a strict '>' scan,
+    and rows with no positive generation are labeled 'Other'. Missing values
+    never win.
+
     Parameters:
     - df: Pandas DataFrame containing the data.
     - wanted_columns: A dictionary mapping column names to plant types.
+
+    Returns:
+    - labels (np.ndarray): The plant type of each row.
     """
+    values = df[list(wanted_columns)].to_numpy(dtype=float)
+    values = np.where(np.isnan(values), -np.inf, values)
 
-    df['plant_type'] = 'Other'
+    # argmax returns the first of equal maxima
+    best = values.argmax(axis=1)
+    best_values = values[np.arange(len(values)), best]
+    types = np.array(list(wanted_columns.values()), dtype=object)
 
-    for index, row in df.iterrows():
-        max_capacity = 0
-        max_type = 'Other'
-        
-        for col, type_name in wanted_columns.items():
-            if row[col] > max_capacity:
-                max_capacity = row[col]
-                max_type = type_name
+    return np.where(best_values > 0, types[best], 'Other')
 
-        df.at[index, 'plant_type'] = max_type
-    
-    return df
 
+def build_plant_index(df_from_db):
+    '''
+        Indexes the plants by ORIS code (orispl), which, unlike the plant
+        name, does not change across eGRID vintages.
+
+        Parameters:
 
-def aggregate_and_rename_power_generation_data(df):
-    '''a ggregates yearly power generation data by energy source and renames the columns for clarity.
-    Parameters: df -  The Pandas DataFrame containing the energy production data with specific
-      columns for each energy source.
-    
-    Returns:
-    - df_grouped_renamed (DataFrame): The aggregated and renamed Pandas DataFrame with yearly sums
-      of power generation capacities for each energy source.
+        df_from_db: (df) containing the energy production data, including
+        orispl, year, plant name, generation capacity, longitude, latitude,
+        and plant type.
+
+        Returns:
+
+        plant_index (dict): 'capacity', the total generating capacity of each
+        plant (rows) and year (columns); 'plant_type', the plant type of each
+        plant and year, missing when the plant is not in a year's data; and
+        'plants', the name and location of each plant from its latest year.
     '''
-    df_grouped = df.groupby('year').agg({
-        'plgenacl': 'sum',
-        'plgenags': 'sum',
-        'plgenanc': 'sum',
-        'plgenawi': 'sum', 
-        'plgenaso': 'sum',
-        'other_sources': 'sum',
-    }).reset_index()
-
-    df_grouped_renamed = df_grouped.rename(columns={
-        'plgenacl': 'Coal',
-        'plgenags': 'Gas',
-        'plgenanc': 'Nuclear',
-        'plgenawi': 'Wind',
-        'plgenaso': 'Solar',
-        'other_sources': 'Other'
-    })
-
-    return df_grouped_renamed
-
-def prepare_data_for_bubble_map(df_from_db, selected_year, plant_type_colors):
+    df = df_from_db.dropna(subset=['orispl']).sort_values('year', kind='stable')
+
+    capacity = df.pivot_table(index='orispl', columns='year',
+                              values='total_gen_capacity', aggfunc='sum',
+                              dropna=False)
+    plant_type = df.drop_duplicates(['orispl', 'year'], keep='last')\
+        .pivot(index='orispl', columns='year', values='plant_type')\
+        .reindex(capacity.index)
+    plants = df.drop_duplicates('orispl', keep='last')\
+        .set_index('orispl')[['pname', 'lon', 'lat']].reindex(capacity.index)
+
+    return {'capacity': capacity, 'plant_type': plant_type, 'plants': plants}
+
+def prepare_data_for_bubble_map(plant_index, selected_year, plant_type_colors):
     '''
         Prepares data for creating a bubble map visualization, showing the change in generating capacity by plant.
         Parameters:
 
-        df_from_db: (df) containing the energy production data, including 
-        year, plant name, generation capacity, longitude, latitude, and plant type.
+        plant_index (dict): The capacity, plant type and plant tables built by
+        build_plant_index.
 
         selected_year (int or str): The year selected for analysis. The function also considers the year 
         prior to the selected year to calculate changes in generating capacity.
@@ -104,26 +133,35 @@ def prepare_data_for_bubble_map(df_from_db, selected_year, plant_type_colors):
         df_diff (df): A DataFrame containing the prepared data for each plant, including the change 
         in generating capacity, coordinates for mapping, plant type, bubble size, and color for the visualization.
     '''
-
-
     selected_year = int(selected_year)
-    df_previous_and_selected = df_from_db[df_from_db['year'].isin([selected_year - 1, selected_year])]
-
-    # Group by plant name and year, then pivot to get a wide-form DataFrame
-    df_grouped = df_previous_and_selected.groupby(['pname', 'year'])['total_gen_capacity'].sum().reset_index()
-    df_diff = df_grouped.pivot(index='pname', columns='year', values='total_gen_capacity')
-    df_diff['change'] = df_diff[selected_year] - df_diff.get(selected_year - 1, 0)
-
-    df_locations = df_from_db[['pname', 'lon', 'lat']].drop_duplicates(subset='pname')
-    df_diff = df_diff.reset_index().merge(df_locations, on='pname', how='left')
-    df_diff = df_diff.merge(df_from_db[['pname', 'plant_type']].drop_duplicates(), on='pname', how='left')
+    previous_year = selected_year - 1
+    capacity = plant_index['capacity']
+    plant_type = plant_index['plant_type']
+    if selected_year not in capacity.columns:
+        return pd.DataFrame(columns=['orispl', 'pname', 'change', 'lon', 'lat',
+                                     'plant_type', 'size', 'color', 'text'])
+
+    # the plants in the data of either year
+    in_years = plant_type[selected_year].notna()
+    if previous_year in capacity.columns:
+        in_years |= plant_type[previous_year].notna()
+        # plants missing from one of the years have no change
+        change = capacity[selected_year] - capacity[previous_year]
+        types = plant_type[selected_year].fillna(plant_type[previous_year])
+    else:
+        change = capacity[selected_year]
+        types = plant_type[selected_year]
+
+    df_diff = plant_index['plants'][in_years].copy()
+    df_diff['change'] = change[in_years].fillna(0)
+    df_diff['plant_type'] = types[in_years]
+    df_diff = df_diff.reset_index()
 
     # Calculate the size of the bubbles based on the change in generating capacity
-    df_diff['change'] = df_diff['change'].fillna(0)
-    max_change = max(np.abs(df_diff['change'])) + 1e-9
+    max_change = np.abs(df_diff['change']).max() + 1e-9
     df_diff['size'] = np.abs(df_diff['change']) / max_change * 50
 
     df_diff['color'] = df_diff['plant_type'].map(plant_type_colors)
     df_diff['text'] = df_diff['pname'] + ' (' + df_diff['plant_type'] + '): ' + df_diff['change'].astype(str) + ' MW'
 
-    return df_diff
\ No newline at end of file
+    return df_diff
@@ -0,0 +1,101 @@
+'''
+The SQL queries run against plants.db. The queries on the plants and elec
+tables are kept in one place so the database build can check that each of
+them is served by an index. The pages read the small summary tables built
+from them.
+'''
+
+# energy generation and carbon emission by state and for the US
+PLANTS_BY_STATE_YEAR = '''
+    SELECT year, state_id,
+    sum(plngenan) as total_energy, sum(plgenatn) as non_renewable_energy, sum(plgenatr) as renewable_energy,
+    sum(plco2an) as carbon_emission
+    FROM plants 
+    GROUP BY year_state
+    UNION
+    SELECT year, 'US' as state_id,
+    sum(plngenan) as total_energy, sum(plgenatn) as non_renewable_energy, sum(plgenatr) as renewable_energy,
+    sum(plco2an) as carbon_emission
+    FROM plants 
+    GROUP BY year;
+'''
+
+# energy prices by state and for the US
+PRICE_BY_STATE_YEAR = '''
+    SELECT year, stateid, price_all as total_average_price, price_com as commercial_price, price_ind as indusrial_price, price_res as residential_price
+    FROM elec_table
+    GROUP BY year, stateid
+    UNION
+    SELECT year, 'US' as stateid, price_all as total_average_price, price_com as commercial_price, price_ind as indusrial_price, price_res as residential_price
+    FROM elec_table
+    GROUP BY year; 
+'''
+
+# renewable and non renewable generation by state and year
+TOTAL_GENERATION = '''
+    SELECT p.year_state, p.year, p.state_id, p.plfuelct,
+    sum(p.PLGENATN) as total_non_renew_gen, sum(p.PLGENATR) as total_renew_gen
+    FROM plants p
+    GROUP BY p.year_state, p.year;
+'''
+
+# yearly generation by fuel type, other sources grouped together
+FUEL_BY_YEAR = '''
+    SELECT year,
+    total(plgenacl) as Coal, total(plgenags) as Gas, total(plgenanc) as Nuclear,
+    total(plgenawi) as Wind, total(plgenaso) as Solar,
+    total(coalesce(plgenaol, 0) + coalesce(plgenagt, 0) + coalesce(plgenabm, 0)
+          + coalesce(plgenaof, 0) + coalesce(plgenahy, 0) + coalesce(plgenaop, 0))
+        as Other
+    FROM plants
+    GROUP BY year;
+'''
+
+# generation and its share of the yearly total by trends page plant type
+GENERATION_BY_PLANT_TYPE = '''
+    SELECT year, trend_plant_type as plant_type,
+    total(plgenatn + plgenatr) as total_generation_plant_type,
+    total(plgenatn + plgenatr)
+        / sum(total(plgenatn + plgenatr)) OVER (PARTITION BY year) * 100
+        as percentage
+    FROM plants
+    GROUP BY year, trend_plant_type;
+'''
+
+# number of plants by state and trends page plant type
+COUNTS_BY_PLANT_TYPE = '''
+    SELECT year, state_id, trend_plant_type as plant_type, count(*) as count
+    FROM plants
+    WHERE state_id IS NOT NULL
+    GROUP BY year, state_id, trend_plant_type;
+'''
+
+# every query on the plants and elec tables, by name
+QUERIES = {
+    "plants_by_state_year": PLANTS_BY_STATE_YEAR,
+    "price_by_state_year": PRICE_BY_STATE_YEAR,
+    "generation_by_plant_type": GENERATION_BY_PLANT_TYPE,
+    "counts_by_plant_type": COUNTS_BY_PLANT_TYPE,
+    "total_generation": TOTAL_GENERATION,
+    "fuel_by_year": FUEL_BY_YEAR,
+}
+
+# reads of the summary tables built with the database
+STATE_YEAR_SUMMARY = "SELECT * FROM state_year_summary ORDER BY year, state_id;"
+PRICE_SUMMARY = "SELECT * FROM price_summary ORDER BY year, stateid;"
+FUEL_YEAR_SUMMARY = "SELECT * FROM fuel_year_summary ORDER BY year;"
+PLANT_TYPE_GENERATION = """
+    SELECT * FROM plant_type_generation ORDER BY year, plant_type;
+"""
+PLANT_TYPE_COUNTS = """
+    SELECT * FROM plant_type_counts ORDER BY year, state_id, plant_type;
+"""
+PROJECTIONS_FOR_TARGET = """
+    SELECT state_id, predicted_year, outcome, statistically_significant
+    FROM projections WHERE target = ? ORDER BY state_id;
+"""
+TRAJECTORY_STATES = "SELECT DISTINCT state_id FROM trajectories ORDER BY state_id;"
+TRAJECTORIES_FOR_STATE = """
+    SELECT model, year, estimate, lower, upper
+    FROM trajectories WHERE state_id = ? ORDER BY model, year;
+"""
@@ -1,46 +1,27 @@
 '''
 This script will use linear regression to predict when states will
-reach a specified percentage of renewable energy.
+reach a specified percentage of renewable energy. The regressions of all
+states are fitted together with NumPy.
 
 Author:
     Praveen Chandar Devarajan
 '''
 
+import math
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-import statsmodels.api as sm
-import sqlite3
+from scipy import stats
+from watts_up.data_viz.db import query_df
+from watts_up.data_viz.queries import TOTAL_GENERATION
 
-DB_NAME = "plants" #Enter new DB name if changed
-
-def connect_database(db_name):
-    """
-    Connect to the SQLite database.
-    Input:
-        Name of the database
-    Returns:
-        Database connection object.
-    """
-    conn = sqlite3.connect(f'watts_up/data/final_data/{db_name}.db')
-    return conn
-
-def query_totgen(conn):
+def query_totgen():
     """
     Query total generation data from the database.
 
-    Args:
-        conn (sqlite3.Connection): Database connection object.
-
     Returns:
         pd.DataFrame: DataFrame containing total generation data.
     """
-    query = '''
-        SELECT p.year_state, p.year, p.state_id, p.plfuelct,
-        sum(p.PLGENATN) as total_non_renew_gen, sum(p.PLGENATR) as total_renew_gen
-        FROM plants p
-        GROUP BY p.year_state, p.year;
-    '''
-    data = pd.read_sql_query(query, conn)
+    data = query_df(TOTAL_GENERATION)
     return data
 
 def prediction_data_prep(data):
@@ -66,6 +47,139 @@ def prediction_data_prep(data):
 
     return data
 
+def train_indices(n_samples, test_size=0.2, random_state=100):
+    """
+    Picks the training rows as sklearn's train_test_split does, so the
+    projections are unchanged: the rows are shuffled with a RandomState seeded
+    with random_state and the first ceil(test_size * n) go to the test set.
+
+    Args:
+        n_samples (int): The number of rows.
+        test_size (float): The share of rows held out for testing.
+        random_state (int): The seed of the shuffle.
+
+    Returns:
+        np.ndarray: The positions of the training rows.
+    """
+    n_test = math.ceil(test_size * n_samples)
+    permutation = np.random.RandomState(random_state).permutation(n_samples)
+    return permutation[n_test:]
+
+def batched_ols(X, y):
+    """
+    Fits one ordinary least squares regression per stacked design matrix, as
+    statsmodels OLS does (pseudo-inverse, residual degrees of freedom from
+    the matrix rank). Rows of zeros pad the regressions with fewer
+    observations; they do not change the fits.
+
+    Args:
+        X (np.ndarray): The design matrices, of shape (regressions, rows,
+          coefficients).
+        y (np.ndarray): The dependent variables, of shape (regressions, rows).
+        
+    Returns:
+        (np.ndarray, np.ndarray): The coefficients and their two-sided
+        p-values, of shape (regressions, coefficients).
+    """
+    pinv = np.linalg.pinv(X)
+    params = np.einsum('kcm,km->kc', pinv, y)
+    resid = y - np.einsum('kmc,kc->km', X, params)
+    df_resid = (X.any(axis=2).sum(axis=1)
+                - np.linalg.matrix_rank(X)).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = (resid ** 2).sum(axis=1) / df_resid
+        cov_diag = np.einsum('kcm,kcm->kc', pinv, pinv)
+        t_values = params / np.sqrt(cov_diag * scale[:, None])
+    p_values = 2 * stats.t.sf(np.abs(t_values), df_resid[:, None])
+    return params, p_values
+
+def fit_state_regressions(data):
+    """
+    Fits the regression year ~ Percentage_Renewable of every state on its
+    training rows in one batch.
+
+    Args:
+        data (pd.DataFrame): Input DataFrame (cleaned and columns added).
+
+    Returns:
+        pd.DataFrame: The intercept, slope and slope p-value of each state.
+    """
+    grouped = data.groupby('state_id')
+    state = grouped.ngroup().to_numpy()
+    position = grouped.cumcount().to_numpy()
+    sizes = grouped.size()
+
+    # the training rows only depend on the number of rows of a state
+    # currently the testing data is not utilized, but can be for a 
+    # future iteration
+    n_rows = sizes.max() if len(sizes) else 0
+    is_train = {}
+    for n in sizes.unique():
+        is_train[n] = np.zeros(n_rows, dtype=bool)
+        is_train[n][train_indices(n)] = True
+    train = np.array([is_train[n] for n in sizes]).reshape(len(sizes), n_rows)
+    train = train[state, position]
+
+    # each state's rows fill its matrix in order, other rows are left at 0
+    X = np.zeros((len(sizes), n_rows, 2))
+    y = np.zeros((len(sizes), n_rows))
+    X[state[train], position[train], 0] = 1
+    X[state[train], position[train], 1] = data['Percentage_Renewable'].to_numpy()[train]
+    y[state[train], position[train]] = data['year'].to_numpy()[train]
+
+    #Linear regression (year ~ Percentage_Renewable + E)
+    params, p_values = batched_ols(X, y)
+    return pd.DataFrame({'intercept': params[:, 0], 'slope': params[:, 1],
+                         'p_value': p_values[:, 1]}, index=sizes.index)
+
+def project_targets(data, targets):
+    """
+    Predict when states will hit each of several shares of renewable energy
+    in total energy. The regressions do not depend on the target, so they
+    are fitted once for all targets.
+
+    Args:
+        data (pd.DataFrame): Input DataFrame (cleaned and columns added).
+        targets (list): Desired percentages of renewable energy.
+
+    Returns:
+        pd.DataFrame: One row per target and state, with the predicted year
+        (missing unless the outcome is 'Predicted'), the outcome
+        ('Predicted', 'Not predictable' or 'Already there!') and whether the
+        regression is statistically significant.
+    """
+    fits = fit_state_regressions(data)
+    latest = data.drop_duplicates('state_id', keep='last')\
+        .set_index('state_id')['Percentage_Renewable']
+    current_year = pd.to_datetime('today').year
+
+    # one row per target, one column per state
+    targets = np.asarray(targets, dtype=float)
+    predicted_year = np.round(fits['intercept'].to_numpy()
+                              + np.outer(targets, fits['slope'].to_numpy()))
+    below = latest.reindex(fits.index).to_numpy() < targets[:, None]
+
+    #The prediction gives non-sensical years when the data is not varying
+    #enough to make predictions
+    outcome = np.where(~below, 'Already there!',
+                       np.where(predicted_year >= current_year, 'Predicted',
+                                'Not predictable'))
+    #A state already there at the given percent shows the significance of
+    #the previous state fitted
+    significant = np.where(fits['p_value'].to_numpy() < 0.05, 'Yes', 'No')
+    significance = pd.DataFrame(np.where(below, significant, None))\
+        .ffill(axis=1).to_numpy()
+
+    return pd.DataFrame({
+        'target': np.repeat(targets, len(fits)),
+        'state_id': np.tile(fits.index.to_numpy(), len(targets)),
+        'predicted_year': pd.array(np.where(outcome == 'Predicted',
+                                            predicted_year, np.nan).ravel(),
+                                   dtype='Int64'),
+        'outcome': outcome.ravel(),
+        'statistically_significant': significance.ravel(),
+    })
+
 def predict_renewable_energy(data, percent_required):
     """
     Predict when states will hit %share of renewable energy in
@@ -78,63 +192,26 @@ def predict_renewable_energy(data, percent_required):
     Returns:
         pd.DataFrame: DataFrame containing prediction results.
     """
-    results = []
-    #grouping data by state to run regression
-    grouped_data = data.groupby('state_id')
-    for state, state_data in grouped_data:
-        if state_data["Percentage_Renewable"].iloc[-1] < percent_required:
-            # currently the testing data is not utilized, but can be for a 
-            # future iteration
-            train_data, _ = train_test_split(state_data,\
-                                                      test_size=0.2,\
-                                                        random_state=100)
-            X_train = train_data[['Percentage_Renewable']]
-            y_train = train_data['year']
-            X_train = sm.add_constant(X_train)
-            #Linear regression (year ~ Percentage_Renewable + E)
-            model = sm.OLS(y_train, X_train).fit()
-            p_value = model.pvalues['Percentage_Renewable']
-            predicted_year = round(model.predict([1, percent_required])[0])
-            statistically_significant = 'Yes' if p_value < 0.05 else 'No'
-            current_year = pd.to_datetime('today').year
-
-            if predicted_year >= current_year:
-                statistically_significant = 'Yes' if p_value < 0.05 else 'No'
-                results.append({'state_id': state, 'predicted_year': \
-                                int(predicted_year),
-                                'statistically_significant': \
-                                statistically_significant})
-            else:
-                #This handles the case where the data is not varying enough to 
-                #make predictions- so the prediction gives non-sensical years
-                statistically_significant = 'Yes' if p_value < 0.05 else 'No'
-                predicted_year = 'Not predictable'
-                results.append({'state_id': state, 'predicted_year': \
-                                predicted_year,
-                                'statistically_significant': \
-                                statistically_significant})
-        else:
-            #Case when the state is already there at the given percent
-            results.append({'state_id': state, 'predicted_year': \
-                            'Already there!',
-                            'statistically_significant': \
-                            statistically_significant})
-
-    results_df = pd.DataFrame(results)
-    results_df.to_csv('watts_up/data/final_data/predictions.csv')
-    print("prediction works")
+    projections = project_targets(data, [percent_required])
+    predicted_year = [int(year) if outcome == 'Predicted' else outcome
+                      for year, outcome in zip(projections['predicted_year'],
+                                               projections['outcome'])]
+    return pd.DataFrame({
+        'state_id': projections['state_id'],
+        'predicted_year': predicted_year,
+        'statistically_significant': projections['statistically_significant'],
+    })
 
 def run_prediction(percent_required):
     """
     Run the renewable energy prediction.
 
     Args:
-        data (pd.DataFrame): Input DataFrame.
         percent_required (float): Desired percentage of renewable energy.
+
+    Returns:
+        pd.DataFrame: DataFrame containing prediction results.
     """
-    db_name = DB_NAME
-    conn = connect_database(db_name)
-    data_prediction = query_totgen(conn)
+    data_prediction = query_totgen()
     prepped_df = prediction_data_prep(data_prediction)
-    predict_renewable_energy(prepped_df, percent_required)
-
+    return predict_renewable_energy(prepped_df, percent_required)
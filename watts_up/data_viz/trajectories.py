@@ -0,0 +1,198 @@
+'''
+This script fits nonlinear trajectories of the renewable share of each state:
+a logistic curve, as adoption tends to follow an S-curve, and a damped Holt
+trend model. Both come with bootstrap confidence intervals. The states are
+fitted across a pool of processes when the database is built, and the
+trajectories are read by the predict page.
+
+Author:
+    Praveen Chandar Devarajan
+'''
+
+import multiprocessing
+import pathlib
+import warnings
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.optimize import curve_fit
+from statsmodels.tsa.holtwinters import Holt
+from watts_up.data_processing.columnar import read_table, write_table
+from watts_up.data_viz.regression_predict import prediction_data_prep
+from watts_up.util.util import (PROJECTION_WORKERS, PROJECTION_HORIZON,
+                                BOOTSTRAP_SAMPLES, PROJECTION_SEED,
+                                CONFIDENCE_LEVEL, PROCESS_START_METHOD)
+
+FINAL_DIR = pathlib.Path(__file__).parent.parent / "data/final_data"
+
+def state_shares(plants):
+    """
+    Computes the renewable share of each state and year, as the linear
+    projections do.
+
+    Args:
+        plants (pd.DataFrame): The cleaned plant data.
+
+    Returns:
+        pd.DataFrame: The year, state_id and Percentage_Renewable columns.
+    """
+    data = plants.groupby(['state_id', 'year'], as_index=False).agg(
+        total_non_renew_gen=('plgenatn', 'sum'),
+        total_renew_gen=('plgenatr', 'sum'))
+    data = prediction_data_prep(data)
+    data = data.dropna(subset=['Percentage_Renewable'])
+    return data[['state_id', 'year', 'Percentage_Renewable']]
+
+def logistic(year, capacity, rate, midpoint):
+    """The logistic curve: the share saturates at capacity."""
+    return capacity / (1 + np.exp(-rate * (year - midpoint)))
+
+def fit_logistic(years, shares, p0):
+    """
+    Fits the logistic curve with its capacity bounded by 100%.
+
+    Args:
+        years (np.ndarray): The observed years.
+        shares (np.ndarray): The observed renewable shares (%).
+        p0 (tuple): The starting capacity, rate and midpoint.
+
+    Returns:
+        np.ndarray: The fitted capacity, rate and midpoint, or None if the
+        fit did not converge.
+    """
+    bounds = ([1e-6, -2, years.min() - 100], [100, 2, years.max() + 100])
+    p0 = np.clip(p0, bounds[0], bounds[1])
+    try:
+        params, _ = curve_fit(logistic, years, shares, p0=p0, bounds=bounds,
+                              max_nfev=2000)
+    except (RuntimeError, ValueError):
+        return None
+    return params
+
+def interval(samples):
+    """The lower and upper percentiles of the samples at CONFIDENCE_LEVEL."""
+    tail = (1 - CONFIDENCE_LEVEL) / 2 * 100
+    return np.nanpercentile(samples, [tail, 100 - tail], axis=0)
+
+def logistic_trajectory(years, shares, forecast_years, rng):
+    """
+    Fits the logistic curve and bootstraps its residuals. Each bootstrap fit
+    starts from the point estimate, which it is close to, so it converges in
+    a few iterations.
+
+    Returns:
+        pd.DataFrame: The estimate and interval of each year, empty if the
+        curve could not be fitted.
+    """
+    # start at the current share growing towards 100%
+    p0 = (min(100, max(shares.max() * 1.5, 1)), 0.1, years.max())
+    params = fit_logistic(years, shares, p0)
+    if params is None:
+        return pd.DataFrame()
+
+    fitted = logistic(years, *params)
+    residuals = shares - fitted
+    samples = np.full((BOOTSTRAP_SAMPLES, len(forecast_years)), np.nan)
+    for i in range(BOOTSTRAP_SAMPLES):
+        resampled = fitted + rng.choice(residuals, len(residuals))
+        sample_params = fit_logistic(years, resampled, params)
+        if sample_params is not None:
+            samples[i] = logistic(forecast_years, *sample_params)
+
+    lower, upper = interval(samples)
+    return pd.DataFrame({'year': forecast_years,
+                         'estimate': logistic(forecast_years, *params),
+                         'lower': lower, 'upper': upper})
+
+def holt_trajectory(years, shares, forecast_years, rng):
+    """
+    Fits a damped Holt trend model to the yearly shares, interpolating the
+    years without eGRID data, and simulates its forecasts with errors drawn
+    from its residuals.
+
+    Returns:
+        pd.DataFrame: The estimate and interval of each forecast year.
+    """
+    all_years = np.arange(years.min(), years.max() + 1)
+    series = np.interp(all_years, years, shares)
+    horizon = forecast_years[forecast_years > years.max()]
+    if len(series) < 4 or not len(horizon):
+        return pd.DataFrame()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        result = Holt(series, damped_trend=True,
+                      initialization_method="estimated").fit()
+        estimate = result.forecast(len(horizon))
+        samples = result.simulate(len(horizon), repetitions=BOOTSTRAP_SAMPLES,
+                                  anchor="end", error="add",
+                                  random_errors="bootstrap",
+                                  random_state=rng.integers(2**32))
+
+    lower, upper = interval(np.asarray(samples).T)
+    return pd.DataFrame({'year': horizon, 'estimate': estimate,
+                         'lower': lower, 'upper': upper})
+
+def state_seed(state):
+    """The seed of a state, so its results do not depend on the order or
+    the process the states are fitted in."""
+    return np.random.SeedSequence([PROJECTION_SEED, zlib.crc32(state.encode())])
+
+def fit_state(state, state_data):
+    """
+    Fits the trajectory models of one state.
+
+    Args:
+        state (str): The state.
+        state_data (pd.DataFrame): The year and Percentage_Renewable of the
+          state.
+
+    Returns:
+        pd.DataFrame: The observed shares and the trajectory of each model,
+        shares clipped to 0-100%.
+    """
+    rng = np.random.default_rng(state_seed(state))
+    years = state_data['year'].to_numpy(dtype=float)
+    shares = state_data['Percentage_Renewable'].to_numpy(dtype=float)
+    forecast_years = np.arange(years.min(), PROJECTION_HORIZON + 1)
+
+    frames = [pd.DataFrame({'model': 'observed', 'year': years,
+                            'estimate': shares})]
+    for model, trajectory in [('logistic', logistic_trajectory),
+                              ('holt', holt_trajectory)]:
+        frame = trajectory(years, shares, forecast_years, rng)
+        frames.append(frame.assign(model=model))
+
+    df = pd.concat(frames, ignore_index=True)\
+        .reindex(columns=['model', 'year', 'estimate', 'lower', 'upper'])
+    df[['estimate', 'lower', 'upper']] = df[['estimate', 'lower', 'upper']]\
+        .astype(float).clip(0, 100)
+    df['year'] = df['year'].astype(int)
+    df.insert(0, 'state_id', state)
+    return df
+
+def build_trajectories(max_workers=PROJECTION_WORKERS):
+    """
+    Fits the trajectories of every state across a pool of processes and
+    writes them to trajectories.parquet.
+
+    Args:
+        max_workers (int): The number of processes fitting states. None uses
+          one process per core.
+    """
+    plants = read_table(FINAL_DIR / "cleaned_egrid_data.parquet",
+                        columns=['state_id', 'year', 'plgenatn', 'plgenatr'])
+    shares = state_shares(plants).sort_values(['state_id', 'year'])
+    states = [(state, state_data)
+              for state, state_data in shares.groupby('state_id')]
+
+    context = multiprocessing.get_context(PROCESS_START_METHOD)
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             mp_context=context) as executor:
+        frames = list(executor.map(fit_state, *zip(*states))) if states else []
+
+    columns = ['state_id', 'model', 'year', 'estimate', 'lower', 'upper']
+    trajectories = pd.concat(frames, ignore_index=True) if frames \
+        else pd.DataFrame(columns=columns)
+    write_table(trajectories, FINAL_DIR / "trajectories.parquet")
@@ -1,6 +1,17 @@
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
+from dash import Patch
+
+# map settings shared by the plant location maps
+PLANT_MAP_GEO = dict(
+    scope='usa',
+    projection_type='albers usa',
+    showland=True,
+    landcolor='rgb(217, 217, 217)',
+    countrycolor="RebeccaPurple",
+)
+
 
 def bar_chart(df_filtered, sorted_fuel_types, plant_type_colors):
     traces = []
@@ -44,15 +55,19 @@ def bar_chart(df_filtered, sorted_fuel_types, plant_type_colors):
     return go.Figure(data=traces, layout=layout)
 
 
-def bubble_map(df_diff,plant_type_colors):
+def bubble_map(df_diff,plant_type_colors, plant_types=None):
     bubble_map = go.Figure()
     
     # Iterate over each unique plant type to ensure it gets added to the legend
-    for plant_type in df_diff['plant_type'].unique():
+    # With plant_types, each of them gets a trace, so the figure can be
+    # patched with bubble_map_patch
+    if plant_types is None:
+        plant_types = df_diff['plant_type'].unique()
+    for plant_type in plant_types:
         df_subset = df_diff[df_diff['plant_type'] == plant_type]
         bubble_map.add_trace(go.Scattergeo(
-            lon=df_subset['lon'],
-            lat=df_subset['lat'],
+            lon=df_subset['lon'].round(3),
+            lat=df_subset['lat'].round(3),
             text=df_subset['text'],
             marker=dict(
                 size=df_subset['size'],
@@ -61,7 +76,8 @@ def bubble_map(df_diff,plant_type_colors):
                 line=dict(width=.2, color='black'),
                 opacity=0.7
     ),
-            name=plant_type  
+            name=plant_type,
+            showlegend=not df_subset.empty
         ))
     
     bubble_map.update_layout(
@@ -74,7 +90,26 @@ def bubble_map(df_diff,plant_type_colors):
     return bubble_map
 
 
-def generate_plant_type_map(df_from_db, plant_type_color):
+def bubble_map_patch(df_diff, plant_types):
+    '''
+    Updates a bubble map built with the same plant_types to another year,
+    sending only the data of its traces.
+    '''
+    patch = Patch()
+    for i, plant_type in enumerate(plant_types):
+        df_subset = df_diff[df_diff['plant_type'] == plant_type]
+        patch['data'][i]['lon'] = df_subset['lon'].round(3).tolist()
+        patch['data'][i]['lat'] = df_subset['lat'].round(3).tolist()
+        patch['data'][i]['text'] = df_subset['text'].tolist()
+        patch['data'][i]['marker']['size'] = df_subset['size'].round(2).tolist()
+        patch['data'][i]['showlegend'] = not df_subset.empty
+    return patch
+
+
+def generate_plant_type_map(df_from_db, plant_type_color, year=None, plant_types=None):
+    if year is not None:
+        return plant_type_map_for_year(df_from_db, plant_type_color, year, plant_types)
+
     years = sorted(df_from_db['year'].unique())
     fig = go.Figure()
 
@@ -90,7 +125,7 @@ def generate_plant_type_map(df_from_db, plant_type_color):
             fig.add_trace(go.Scattergeo(
                 lon=df_type_specific['lon'],
                 lat=df_type_specific['lat'],
-                text=df_type_specific.apply(lambda row: f"{row['pname']} ({row['plant_type']})", axis=1),
+                text=df_type_specific['pname'] + ' (' + df_type_specific['plant_type'] + ')',
                 marker=dict(
                     size=marker_size,
                     color=color,
@@ -118,13 +153,7 @@ def generate_plant_type_map(df_from_db, plant_type_color):
     fig.update_layout(
         sliders=sliders,
         title_text='Plant Locations by Type',
-        geo=dict(
-            scope='usa',
-            projection_type='albers usa',
-            showland=True,
-            landcolor='rgb(217, 217, 217)',
-            countrycolor="RebeccaPurple",
-        ),
+        geo=PLANT_MAP_GEO,
         legend_title_text='Plant Type',
         legend=dict(traceorder='normal')
     )
@@ -133,3 +162,65 @@ def generate_plant_type_map(df_from_db, plant_type_color):
     )
 
     return fig
+
+
+def plants_of_year(df_from_db, year):
+    '''The columns of the plant location map for the plants of a year.'''
+    return df_from_db.loc[df_from_db['year'] == int(year), ['lon', 'lat', 'pname', 'plant_type']]
+
+
+def plant_type_map_for_year(df_from_db, plant_type_color, year, plant_types=None):
+    '''
+    Maps the plants of one year, with one trace per plant type. Only the
+    plant names are sent as text: the plant type is part of each trace's
+    hover template, and the coordinates are rounded to 3 decimals (about
+    100 m), which is far below what the map can show. With plant_types, each
+    of them gets a trace, so the figure can be patched with
+    plant_type_map_patch.
+    '''
+    df_year = plants_of_year(df_from_db, year)
+    fig = go.Figure()
+
+    if plant_types is None:
+        plant_types = df_year['plant_type'].unique()
+    for plant_type in plant_types:
+        df_type_specific = df_year[df_year['plant_type'] == plant_type]
+        fig.add_trace(go.Scattergeo(
+            lon=df_type_specific['lon'].round(3).to_numpy(),
+            lat=df_type_specific['lat'].round(3).to_numpy(),
+            text=df_type_specific['pname'].to_numpy(),
+            hovertemplate=f'%{{text}} ({plant_type})<extra></extra>',
+            marker=dict(
+                size=5,
+                color=plant_type_color.get(plant_type, 'grey'),
+                line=dict(width=0.5, color='rgba(0, 0, 0, 0.5)')
+            ),
+            name=plant_type,
+            showlegend=not df_type_specific.empty
+        ))
+
+    fig.update_layout(
+        title_text=f'Plant Locations by Type ({year})',
+        geo=PLANT_MAP_GEO,
+        legend_title_text='Plant Type',
+        legend=dict(traceorder='normal')
+    )
+
+    return fig
+
+
+def plant_type_map_patch(df_from_db, year, plant_types):
+    '''
+    Updates a plant location map built with the same plant_types to another
+    year, sending only the data of its traces and the title.
+    '''
+    df_year = plants_of_year(df_from_db, year)
+    patch = Patch()
+    for i, plant_type in enumerate(plant_types):
+        df_type_specific = df_year[df_year['plant_type'] == plant_type]
+        patch['data'][i]['lon'] = df_type_specific['lon'].round(3).tolist()
+        patch['data'][i]['lat'] = df_type_specific['lat'].round(3).tolist()
+        patch['data'][i]['text'] = df_type_specific['pname'].tolist()
+        patch['data'][i]['showlegend'] = not df_type_specific.empty
+    patch['layout']['title']['text'] = f'Plant Locations by Type ({year})'
+    return patch
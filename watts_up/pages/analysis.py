@@ -5,70 +5,113 @@ types.
 Author: Frank Vasquez
 '''
 from watts_up.util.util import PLANT_TYPE_COLOR
-from watts_up.data_viz.visuals import bar_chart, bubble_map, generate_plant_type_map
-from watts_up.data_viz.data_manager import df_from_db, unique_years
-from watts_up.data_viz.helper import aggregate_and_rename_power_generation_data, prepare_data_for_bubble_map
+from watts_up.data_viz.visuals import bar_chart, bubble_map, bubble_map_patch, generate_plant_type_map, plant_type_map_patch
+from watts_up.data_viz.data_manager import cached_loader, figure_cache, get_plant_data, get_plant_index
+from watts_up.data_viz.helper import load_summary, prepare_data_for_bubble_map
+from watts_up.data_viz.queries import FUEL_YEAR_SUMMARY
 import dash
-from dash import html, dcc,callback
+from dash import html, dcc,callback, no_update
 from dash.dependencies import Input, Output
 import plotly.graph_objects as go
 import plotly.express as px
 
 dash.register_page(__name__, path='/')
 
-# Aggregates and rename power generation data for clearer analysis of plants
-df_grouped_type = aggregate_and_rename_power_generation_data(df_from_db)
 
-total_capacities = {
-    fuel_type: df_grouped_type[fuel_type].sum() 
-    for fuel_type in ['Coal', 'Gas', 'Nuclear', 'Wind', 'Solar', 'Other']
-}
+@cached_loader
+def load_fuel_data():
+    '''Power generation by year and fuel type, summarized with the database,
+    with the fuel types sorted by total capacity.'''
+    df_grouped_type = load_summary(FUEL_YEAR_SUMMARY)
 
-sorted_fuel_types = sorted(total_capacities, key=total_capacities.get)
-df_grouped_type['total_capacity'] = df_grouped_type[sorted_fuel_types].sum(axis=1)
-df_filtered = df_grouped_type[df_grouped_type['total_capacity'] > 0]
+    total_capacities = {
+        fuel_type: df_grouped_type[fuel_type].sum() 
+        for fuel_type in ['Coal', 'Gas', 'Nuclear', 'Wind', 'Solar', 'Other']
+    }
+
+    sorted_fuel_types = sorted(total_capacities, key=total_capacities.get)
+    df_grouped_type['total_capacity'] = df_grouped_type[sorted_fuel_types].sum(axis=1)
+    df_filtered = df_grouped_type[df_grouped_type['total_capacity'] > 0]
+    return df_grouped_type, df_filtered, sorted_fuel_types
+
+
+@cached_loader
+def load_bar_chart():
+    '''The bar chart, which shows every year and so does not depend on the
+    selected year.'''
+    _, df_filtered, sorted_fuel_types = load_fuel_data()
+    bar_chart_fig = bar_chart(df_filtered, sorted_fuel_types, PLANT_TYPE_COLOR)
+    bar_chart_fig.update_layout(legend=dict(x=0, y=1.0, bgcolor='rgba(255,255,255,0.5)'))
+    return bar_chart_fig
+
+
+@cached_loader
+def load_plant_types():
+    '''The plant types of the plant data, in the order of PLANT_TYPE_COLOR.
+    Each gets a trace of both maps, whatever the year, so the callback only
+    patches the data of the traces.'''
+    present = set(get_plant_data()[0]['plant_type'].dropna())
+    return [plant_type for plant_type in PLANT_TYPE_COLOR if plant_type in present] + \
+        sorted(present - set(PLANT_TYPE_COLOR))
+
+
+@cached_loader
+def load_initial_maps():
+    '''The maps of the first year, sent with the layout.'''
+    df_from_db, unique_years = get_plant_data()
+    year = int(unique_years[0])
+    plant_types = load_plant_types()
+    df_diff = prepare_data_for_bubble_map(get_plant_index(), year, PLANT_TYPE_COLOR)
+    bubble_map_fig = bubble_map(df_diff, PLANT_TYPE_COLOR, plant_types)
+    plant_type_map_fig = generate_plant_type_map(df_from_db, PLANT_TYPE_COLOR, year, plant_types)
+    return year, bubble_map_fig, plant_type_map_fig
 
 
 # layout of the Dash page, adds dropdowns for visualizations
-layout = html.Div([
-    html.H1('Analysis Page'),
-    dcc.Dropdown(
-        id='year-dropdown',
-        options=[{'label': year, 'value': year} for year in unique_years],
-        value=unique_years[0]
-    ),
-    html.Div(
-        id='visualizations-container',
-        style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-between'}
-    ),
-    html.Div(id='bar-chart-placeholder'),
-    # Flex container for side-by-side maps
-    html.Div([
-        html.Div(id='map-visualization-placeholder', style={'flex': '1'}),
-        html.Div(id='plant-type-map-placeholder', style={'flex': '1'})
-    ], style={'display': 'flex', 'flexDirection': 'row'}),
-
-])
-
-# callback function to update visualizations based on selected year
+def layout(**kwargs):
+    year, bubble_map_fig, plant_type_map_fig = load_initial_maps()
+    unique_years = load_fuel_data()[0]['year'].tolist()
+    return html.Div([
+        html.H1('Analysis Page'),
+        dcc.Dropdown(
+            id='year-dropdown',
+            options=[{'label': year, 'value': year} for year in unique_years],
+            value=year
+        ),
+        html.Div(
+            id='visualizations-container',
+            style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-between'}
+        ),
+        # the bar chart does not depend on the year and is only sent here
+        html.Div(dcc.Graph(id='bar-chart', figure=load_bar_chart()), id='bar-chart-placeholder'),
+        # Flex container for side-by-side maps
+        html.Div([
+            html.Div(dcc.Graph(id='bubble-map', figure=bubble_map_fig),
+                     id='map-visualization-placeholder', style={'flex': '1'}),
+            html.Div(dcc.Graph(id='plant-type-map', figure=plant_type_map_fig),
+                     id='plant-type-map-placeholder', style={'flex': '1'})
+        ], style={'display': 'flex', 'flexDirection': 'row'}),
+
+    ])
+
+# callback function to update the maps based on selected year, sending only
+# the data of their traces
 @callback(
-    [Output('map-visualization-placeholder', 'children'),
-     Output('bar-chart-placeholder', 'children'),
-     Output('plant-type-map-placeholder', 'children')],
-   [Input('year-dropdown', 'value')]
+    [Output('bubble-map', 'figure'),
+     Output('plant-type-map', 'figure')],
+   [Input('year-dropdown', 'value')],
+   prevent_initial_call=True
 )
-
+@figure_cache()
 def update_visualizations(selected_year):
-    """Update the visualizations based on the selected year."""
-    df_diff = prepare_data_for_bubble_map(df_from_db, selected_year, PLANT_TYPE_COLOR)
-
-    if selected_year is not None:
-        # Generate visualizations based on the selected year
-        bubble_map_fig = bubble_map(df_diff,PLANT_TYPE_COLOR)
-        bar_chart_fig = bar_chart(df_filtered, sorted_fuel_types, PLANT_TYPE_COLOR)
-        plant_type_map_fig = generate_plant_type_map(df_from_db,PLANT_TYPE_COLOR)
+    """Update the maps based on the selected year."""
+    if selected_year is None:
+        return no_update, no_update
 
-        # Update and return figures
-        bar_chart_fig.update_layout(legend=dict(x=0, y=1.0, bgcolor='rgba(255,255,255,0.5)'))
+    df_from_db, _ = get_plant_data()
+    plant_types = load_plant_types()
+    df_diff = prepare_data_for_bubble_map(get_plant_index(), selected_year, PLANT_TYPE_COLOR)
 
-    return dcc.Graph(figure=bubble_map_fig), dcc.Graph(figure=bar_chart_fig), dcc.Graph(figure=plant_type_map_fig)
\ No newline at end of file
+    # only the plants of the selected year are sent to the browser
+    return bubble_map_patch(df_diff, plant_types), \
+        plant_type_map_patch(df_from_db, selected_year, plant_types)
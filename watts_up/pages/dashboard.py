@@ -1,80 +1,100 @@
 import pandas as pd
 import dash
-from dash import Dash, dcc, html, Input, Output, callback
+from dash import Dash, dcc, html, Input, Output, callback, clientside_callback, ClientsideFunction
 import plotly.express as px
-import sqlite3
+from watts_up.data_viz.data_manager import cached_loader, figure_cache
+from watts_up.data_viz.helper import load_summary
+from watts_up.data_viz.queries import STATE_YEAR_SUMMARY, PRICE_SUMMARY
 
 
+#'client' ships the state-year series to the browser once and draws the
+#chart there, 'server' draws it on the server on every dropdown change
+TREND_MODE = 'client'
+
+#the series and labels of each trend, drawn by assets/dashboard.js in the
+#client mode as update_main_plot draws them in the server mode
+TRENDS = {
+    'energy-trend': {'table': 'plants', 'legend': 'energy_type',
+                     'columns': ['total_energy', 'non_renewable_energy', 'renewable_energy'],
+                     'title': 'Energy Generation Trends in', 'yaxis': 'MWh'},
+    'carbon-trend': {'table': 'plants', 'legend': None,
+                     'columns': ['carbon_emission'],
+                     'title': 'Carbon Emission Trends in', 'yaxis': 'short tons = 2,000 pounds'},
+    'price-trend': {'table': 'price', 'legend': 'price_type',
+                    'columns': ['total_average_price', 'commercial_price', 'indusrial_price', 'residential_price'],
+                    'title': 'Energy Price Trends in', 'yaxis': 'cents per Kilowatt-hours'},
+}
+
 dash.register_page(__name__)
 
 
-#Connect to the database
-conn = sqlite3.connect('watts_up/data/final_data/plants.db')
-
-# Query for energy generation and carbon emission data
-query_plants = '''
-    SELECT year, state_id,
-    sum(plngenan) as total_energy, sum(plgenatn) as non_renewable_energy, sum(plgenatr) as renewable_energy,
-    sum(plco2an) as carbon_emission
-    FROM plants 
-    GROUP BY year_state
-    UNION
-    SELECT year, 'US' as state_id,
-    sum(plngenan) as total_energy, sum(plgenatn) as non_renewable_energy, sum(plgenatr) as renewable_energy,
-    sum(plco2an) as carbon_emission
-    FROM plants 
-    GROUP BY year;
-'''
-df_plants = pd.read_sql(query_plants, conn)
-
-# Query for energy price data
-query_price = '''
-    SELECT year, stateid, price_all as total_average_price, price_com as commercial_price, price_ind as indusrial_price, price_res as residential_price
-    FROM elec_table
-    GROUP BY year, stateid
-    UNION
-    SELECT year, 'US' as stateid, price_all as total_average_price, price_com as commercial_price, price_ind as indusrial_price, price_res as residential_price
-    FROM elec_table
-    GROUP BY year; 
-'''
-df_price = pd.read_sql(query_price, conn)
-
-
-layout = html.Div([
-    html.H1("Energy Generation, Emission and Price Trends by State"),
-
-# Dropdown for state selection    
-    dcc.Dropdown(
-        id ='state-dropdown',
-        options = [{'label': state, 'value': state} for state in df_plants['state_id'].unique()],
-        value = 'US'
-    ),
-         
-# Dropdown for trend type selection
-    dcc.Dropdown(
-            id='trend-type-dropdown',
-            options=[
-                {'label': 'Energy Generation Trend', 'value': 'energy-trend'},
-                {'label': 'Carbon Emission Trend', 'value': 'carbon-trend'},
-                {'label': 'Energy Price Trend', 'value': 'price-trend'}
-            ],
-            value='energy-trend', 
-            clearable=False
-    ),
-    
-    # Graph for the selected trend
-    dcc.Graph(id='main-plot'),
-])
+@cached_loader
+def load_trends():
+    """Energy generation, carbon emission and price data by state and for the
+    US, summarized with the database."""
+    df_plants = load_summary(STATE_YEAR_SUMMARY)
+    df_price = load_summary(PRICE_SUMMARY)
+    return df_plants, df_price
 
 
-@callback(
-    Output('main-plot', 'figure'),
-    [Input('state-dropdown', 'value'),
-     Input('trend-type-dropdown', 'value')]
-)
+def series_by_state(df, state_column, columns, decimals):
+    """The year and columns of each state, as lists. Missing values become
+    None, which is null in JSON."""
+    df = df.sort_values('year')
+    rounded = df[columns].round(decimals).astype(object)
+    df = df[['year', state_column]].join(rounded.where(rounded.notna(), None))
+    return {state: {column: state_df[column].tolist() for column in ['year'] + columns}
+            for state, state_df in df.groupby(state_column)}
 
-    
+
+@cached_loader
+def load_trend_store():
+    """The state-year series of the client mode, in a compact columnar
+    encoding: a list per column and state."""
+    df_plants, df_price = load_trends()
+    plant_columns = ['total_energy', 'non_renewable_energy', 'renewable_energy', 'carbon_emission']
+    price_columns = ['total_average_price', 'commercial_price', 'indusrial_price', 'residential_price']
+    return {
+        'trends': TRENDS,
+        'plants': series_by_state(df_plants, 'state_id', plant_columns, 0),
+        'price': series_by_state(df_price, 'stateid', price_columns, 2),
+    }
+
+
+def layout(**kwargs):
+    df_plants, _ = load_trends()
+    return html.Div([
+        html.H1("Energy Generation, Emission and Price Trends by State"),
+
+    # Dropdown for state selection    
+        dcc.Dropdown(
+            id ='state-dropdown',
+            options = [{'label': state, 'value': state} for state in df_plants['state_id'].unique()],
+            value = 'US'
+        ),
+             
+    # Dropdown for trend type selection
+        dcc.Dropdown(
+                id='trend-type-dropdown',
+                options=[
+                    {'label': 'Energy Generation Trend', 'value': 'energy-trend'},
+                    {'label': 'Carbon Emission Trend', 'value': 'carbon-trend'},
+                    {'label': 'Energy Price Trend', 'value': 'price-trend'}
+                ],
+                value='energy-trend', 
+                clearable=False
+        ),
+        
+        # Graph for the selected trend
+        dcc.Graph(id='main-plot'),
+        *([dcc.Store(id='trend-store', data=load_trend_store())]
+          if TREND_MODE == 'client' else []),
+    ])
+
+
+@figure_cache()
 def update_main_plot(selected_state, selected_trend):
+    df_plants, df_price = load_trends()
 
     if selected_trend == 'energy-trend':    
         filtered_df = df_plants[df_plants['state_id'] == selected_state]
@@ -100,3 +120,20 @@ def update_main_plot(selected_state, selected_trend):
     plot_bgcolor='white'
     )    
     return plot
+
+
+if TREND_MODE == 'client':
+    # dropdown changes are handled in the browser, without a server request
+    clientside_callback(
+        ClientsideFunction(namespace='dashboard', function_name='main_plot'),
+        Output('main-plot', 'figure'),
+        [Input('state-dropdown', 'value'),
+         Input('trend-type-dropdown', 'value'),
+         Input('trend-store', 'data')]
+    )
+else:
+    callback(
+        Output('main-plot', 'figure'),
+        [Input('state-dropdown', 'value'),
+         Input('trend-type-dropdown', 'value')]
+    )(update_main_plot)
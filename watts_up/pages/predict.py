@@ -1,73 +1,222 @@
 '''
-    Creates an animated Dash component visualizing the predicted year by which 
-    each state is expected to reach 60% renewable energy.
+    Creates an animated Dash component visualizing the predicted year by which
+    each state is expected to reach a chosen share of renewable energy.
 
     Author: Frank Vasquez
 '''
 import dash
 import pandas as pd
 import plotly.express as px
-from dash import html, dcc
-from watts_up.data_viz.regression_predict import run_prediction
+from dash import html, dcc, callback, clientside_callback, ClientsideFunction, Input, Output, State
+from watts_up.data_viz.charts import create_trajectory_chart
+from watts_up.data_viz.data_manager import cached_loader, figure_cache
+from watts_up.data_viz.db import query_df
+from watts_up.data_viz.queries import (PROJECTIONS_FOR_TARGET,
+                                       TRAJECTORY_STATES,
+                                       TRAJECTORIES_FOR_STATE)
+from watts_up.util.util import PROJECTION_TARGETS, CONFIDENCE_LEVEL
 
-#The percentage input for predicting when states will hit x% renewable mix
+#The percentage input for predicting when states will hit x% renewable mix,
+#shown first
 PREDICT_PERCENT = 60
 
+#'client' sends the predictions once and the browser draws each year of the
+#animation, 'frames' sends a plotly animation with a frame per year
+ANIMATION_MODE = 'client'
+
 dash.register_page(__name__)
 
-def create_animated_renewable_energy_dash_component():
+def split_predictions(data):
     '''
-    This function loads a dataset from a CSV file containing states and their 
-    respective predicted years for achieving 60% renewable energy.
+    Separates the states with a predicted year from the others.
 
-     Returns:
-        A Dash HTML containing the animated bar chart
-    '''
-    percent_predict = PREDICT_PERCENT
-    run_prediction(percent_predict)
-
-    data = pd.read_csv('watts_up/data/final_data/predictions.csv')
-    data['predicted_year'] = pd.to_numeric(data['predicted_year'], errors='coerce', downcast='integer')
+    Parameters:
+    - data: The projections of the target, read from the database.
 
+    Returns:
+        The projections of the states with a predicted year and the notice
+        listing the other states
+    '''
     not_predictable_states = data[data['predicted_year'].isna()]['state_id'].unique()
     not_predictable_notice = "Note: Predictions are not available for the following states: " + ", ".join(not_predictable_states) + "."
 
     predictable_data = data.dropna(subset=['predicted_year'])
+    return predictable_data, not_predictable_notice
+
+
+def create_animated_renewable_energy_chart(data, percent_predict):
+    '''
+    This function creates the animated bar chart of the states and their
+    respective predicted years for achieving a share of renewable energy.
+
+    Parameters:
+    - data: The projections of the target, read from the database.
+    - percent_predict: The target share of renewable energy.
+
+     Returns:
+        The animated bar chart and the notice listing the states without
+        a prediction
+    '''
+    predictable_data, not_predictable_notice = split_predictions(data)
+    if predictable_data.empty:
+        return px.bar(title=f'No state is projected to reach {percent_predict}% Renewable Energy'), not_predictable_notice
 
     # determines minimum and maximum years in the dataset for the animation range
-    min_year = data['predicted_year'].min()
-    max_year = data['predicted_year'].max()
-    min_year = int(min_year)
-    max_year = int(max_year)
-
-    frames_data = pd.DataFrame()
-
-    # creates a df  for each year in the range, marking progress towards the goal    
-    for year in range(min_year, max_year + 1):
-        year_data = predictable_data.copy()
-        year_data['display_year'] = year_data['predicted_year'].apply(lambda x: x if x <= year else None)
-        year_data['year'] = year
-        # Aggregate the data for all frames
-        frames_data = pd.concat([frames_data, year_data])
-        
+    min_year = int(predictable_data['predicted_year'].min())
+    max_year = int(predictable_data['predicted_year'].max())
+
+    # one row per state and year in the range, marking progress towards the goal
+    predictable_data = predictable_data.astype({'predicted_year': float})
+    frames_data = predictable_data.merge(
+        pd.DataFrame({'year': range(min_year, max_year + 1)}), how='cross')
+    frames_data['display_year'] = frames_data['predicted_year'].where(
+        frames_data['predicted_year'] <= frames_data['year'])
 
     fig = px.bar(frames_data, x='state_id', y='display_year', animation_frame='year',
-                 title='Progress Towards 60% Renewable Energy by State',
+                 title=f'Progress Towards {percent_predict}% Renewable Energy by State',
                  labels={'state_id': 'State', 'display_year': 'Predicted Year'},
                  range_y=[min_year, max_year])
 
     fig.update_layout(xaxis_title="State",
                       yaxis_title="Predicted Year",
                       plot_bgcolor="white",
-                      transition={'duration': 50}, 
+                      transition={'duration': 50},
                       xaxis=dict(showline=True, showgrid=False, linecolor='black'),
                       yaxis=dict(showgrid=True, gridcolor='lightgrey'),
                       )
 
+    return fig, not_predictable_notice
+
+
+def progress_data(data, percent_predict):
+    '''
+    The predictions sent to the browser in the client animation mode, where
+    assets/predict.js draws each year of the animation from them.
+
+    Parameters:
+    - data: The projections of the target, read from the database.
+    - percent_predict: The target share of renewable energy.
+
+     Returns:
+        The predictions by column, with the range of the animation, and the
+        notice listing the states without a prediction
+    '''
+    predictable_data, not_predictable_notice = split_predictions(data)
+    years = predictable_data['predicted_year'].astype(int)
+    return {
+        'state_id': predictable_data['state_id'].tolist(),
+        'predicted_year': years.tolist(),
+        'min_year': int(years.min()) if len(years) else None,
+        'max_year': int(years.max()) if len(years) else None,
+        'title': f'Progress Towards {percent_predict}% Renewable Energy by State',
+    }, not_predictable_notice
+
+
+@cached_loader
+def load_trajectory_states():
+    """The states with fitted trajectories."""
+    return query_df(TRAJECTORY_STATES)['state_id'].tolist()
+
+
+def progress_components():
+    '''The components of the client animation mode.'''
+    return [
+        dcc.Store(id='projection-store'),
+        dcc.Graph(id='progress-bar-chart'),
+        html.Div([
+            html.Button('Play', id='play-button', n_clicks=0),
+            html.Div(dcc.Slider(id='animation-year', step=1, min=0, max=0,
+                                value=0), style={'flex': '1'}),
+        ], style={'display': 'flex', 'alignItems': 'center'}),
+        dcc.Interval(id='animation-interval', interval=300, disabled=True),
+        html.P(id='progress-notice'),
+    ]
+
+
+def layout(**kwargs):
+    states = load_trajectory_states()
     return html.Div([
         html.H1("Renewable Energy Prediction Progress"),
-        dcc.Graph(id='animated-bar-chart', figure=fig),
-        html.P(not_predictable_notice) 
+        html.P("Share of renewable energy (%)"),
+        dcc.Slider(id='target-slider', min=PROJECTION_TARGETS[0],
+                   max=PROJECTION_TARGETS[-1], step=1, value=PREDICT_PERCENT,
+                   marks={target: str(target) for target in PROJECTION_TARGETS
+                          if target % 10 == 0},
+                   tooltip={'placement': 'bottom'}),
+        *(progress_components() if ANIMATION_MODE == 'client'
+          else [dcc.Graph(id='animated-bar-chart'),
+                html.P(id='not-predictable-notice')]),
+        html.H2("Renewable Energy Share Trajectories"),
+        dcc.Dropdown(id='trajectory-state-dropdown',
+                     options=[{'label': state, 'value': state} for state in states],
+                     value=states[0] if states else None),
+        dcc.Graph(id='trajectory-chart'),
+        html.P("The logistic and damped Holt trend models are fitted when the "
+               f"database is built. Bands show their {CONFIDENCE_LEVEL:.0%} "
+               "bootstrap intervals.")
     ])
-# Assign the component to the layout variable for viz
-layout = create_animated_renewable_energy_dash_component()
\ No newline at end of file
+
+
+# the projections of every target are computed when the database is built
+@figure_cache()
+def update_projection(percent_predict):
+    data = query_df(PROJECTIONS_FOR_TARGET, (int(percent_predict),))
+    return create_animated_renewable_energy_chart(data, percent_predict)
+
+
+@figure_cache()
+def update_progress_data(percent_predict):
+    data = query_df(PROJECTIONS_FOR_TARGET, (int(percent_predict),))
+    store, not_predictable_notice = progress_data(data, percent_predict)
+    min_year = store['min_year'] or 0
+    max_year = store['max_year'] or 0
+    marks = {year: str(year) for year in range(min_year, max_year + 1)
+             if year in (min_year, max_year) or year % 10 == 0}
+    return store, not_predictable_notice, min_year, max_year, marks
+
+
+if ANIMATION_MODE == 'client':
+    callback(
+        [Output('projection-store', 'data'),
+         Output('progress-notice', 'children'),
+         Output('animation-year', 'min'),
+         Output('animation-year', 'max'),
+         Output('animation-year', 'marks')],
+        [Input('target-slider', 'value')]
+    )(update_progress_data)
+
+    # the animation runs in the browser: the play button and the interval
+    # step through the years, and the chart of a year is drawn from the
+    # stored predictions
+    clientside_callback(
+        ClientsideFunction(namespace='predict', function_name='step'),
+        [Output('animation-year', 'value'),
+         Output('animation-interval', 'disabled')],
+        [Input('play-button', 'n_clicks'),
+         Input('animation-interval', 'n_intervals'),
+         Input('projection-store', 'data')],
+        [State('animation-year', 'value')]
+    )
+    clientside_callback(
+        ClientsideFunction(namespace='predict', function_name='progress_figure'),
+        Output('progress-bar-chart', 'figure'),
+        [Input('animation-year', 'value'),
+         Input('projection-store', 'data')]
+    )
+else:
+    callback(
+        [Output('animated-bar-chart', 'figure'),
+         Output('not-predictable-notice', 'children')],
+        [Input('target-slider', 'value')]
+    )(update_projection)
+
+
+# the trajectories are fitted when the database is built
+@callback(
+    Output('trajectory-chart', 'figure'),
+    [Input('trajectory-state-dropdown', 'value')]
+)
+@figure_cache()
+def update_trajectories(state):
+    data = query_df(TRAJECTORIES_FOR_STATE, (state,))
+    return create_trajectory_chart(data, state)
@@ -5,117 +5,67 @@ treemap of fuel type based data for a selected year.
 Author:
 Praveen Chandar Devarajan
 '''
-import sqlite3
-import pandas as pd
 import dash
 from dash import html, dcc,callback,Input,Output
 from watts_up.data_viz.charts import create_line_chart,create_treemap
-from watts_up.data_viz.helper import plant_type
-
-
-#used to label each row to a fuel type
-#(Coal vs gas vs solar based on raw data column name)
-COLUMNS_CHECK = ['plgenacl', 'plgenags', 'plgenanc', 'plgenawi',
-                    'plgenaso', 'plgenaol', 'plgenagt', 'plgenabm',
-                    'plgenaof', 'plgenahy', 'plgenaop']
-COLUMNS_WANTED = {'plgenacl': "COAL", 'plgenags': "GAS", 'plgenanc': "NUCLEAR",
-                    'plgenawi': "WIND", 'plgenaso': "SOLAR"}
+from watts_up.data_viz.data_manager import cached_loader, figure_cache
+from watts_up.data_viz.db import query_df
+from watts_up.data_viz.queries import PLANT_TYPE_GENERATION, PLANT_TYPE_COUNTS
 
 
 #fuel types considered for the charts
 PLANT_PLOTTING = ['GAS', 'NUCLEAR', 'COAL', 'WIND', 'SOLAR']
 
-#enter the new database name here if changed.
-DB_NAME = "plants"
-
 dash.register_page(__name__)
 
-def connect_database(db_name):
-    """
-    Connect to the SQLite database.
-    Input:
-        Name of the database
-    Returns:
-        sqlite3.Connection: Database connection object.
-    """
-    conn = sqlite3.connect(f'watts_up/data/final_data/{db_name}.db')
-    return conn
-
-def query_planttypes(conn):
-    """
-    Query plant types data from the database.
-
-    Input:
-        conn (sqlite3.Connection): Database connection object.
-
-    Returns:
-        pd.DataFrame: DataFrame containing plant types data.
-    """
-    columns_check_str = ', '.join(COLUMNS_CHECK)
-    
-    query = f'''
-        SELECT p.year_state, p.year, p.state_id, {columns_check_str},
-               p.PLFUELCT, p.PLGENATN as renew_gen, p.PLGENATR as non_renew
-        FROM plants p;
-    '''
-    df = pd.read_sql_query(query, conn)
-    return df
-
 
-def prep_line_chart(df):
+@cached_loader
+def load_plant_types():
     """
-    Prepare data for a line chart.
-
-    Args:
-        df (pd.DataFrame): Input DataFrame.
+    Load the generation and plant counts by plant type. The plants are labeled
+    and aggregated by plant type when the database is built.
 
     Returns:
-        pd.DataFrame: DataFrame containing prepared data for the line chart.
+        (pd.DataFrame, pd.DataFrame): The line chart data and the number of
+        plants by year, state and plant type.
     """
-    #Use helper function to label the plant into plant_types
-    df = plant_type(df,COLUMNS_WANTED)
-
-    # Group by and create the required columns
-    df['total_generation'] = df["renew_gen"] + df["non_renew"]
-    counts = df.groupby(['year', 'plant_type'])['total_generation'].\
-        sum().reset_index(name = 'total_generation_plant_type')
-    counts['percentage'] = (counts['total_generation_plant_type'] /\
-                             counts.groupby('year')['total_generation_plant_type'].\
-                                transform('sum')) * 100
-    return counts
-
+    line_chartdf = query_df(PLANT_TYPE_GENERATION)
+    plant_counts = query_df(PLANT_TYPE_COUNTS)
+    return line_chartdf, plant_counts
 
-db_name = DB_NAME 
-conn = connect_database(db_name)
-data_chart = query_planttypes(conn)
-conn.close()
 
-line_chartdf = prep_line_chart(data_chart)
-line_chart = create_line_chart(line_chartdf, PLANT_PLOTTING)
+@cached_loader
+def load_line_chart():
+    """Create the line chart of the generation share by plant type."""
+    line_chartdf, _ = load_plant_types()
+    return create_line_chart(line_chartdf, PLANT_PLOTTING)
 
 
 #Layout creation for DASH
-layout = html.Div([
-    html.H1('Analyzing total energy production by plant category'),
-    (dcc.Graph(figure=line_chart)),
-    html.H2('TREEMAPS for total number of plants for a year and fuel type'),
-    #Drop down for the tree-map, the options are years and plant_types
-    dcc.Dropdown(id='type-dropdown',
-                 options=[{'label': plant_type, 'value': plant_type}\
-                           for plant_type in PLANT_PLOTTING],
-                 value='COAL'),
-    dcc.Dropdown(id='year-dropdown',
-                 options=[{'label': '2004', 'value': 2004}, {'label': '2014',\
-                                                              'value': 2014},
-                          {'label': '2022', 'value': 2022}],
-                 value=2004),
-    dcc.Graph(id='treemap-graph')  
-])
+def layout(**kwargs):
+    return html.Div([
+        html.H1('Analyzing total energy production by plant category'),
+        (dcc.Graph(figure=load_line_chart())),
+        html.H2('TREEMAPS for total number of plants for a year and fuel type'),
+        #Drop down for the tree-map, the options are years and plant_types
+        dcc.Dropdown(id='type-dropdown',
+                     options=[{'label': plant_type, 'value': plant_type}\
+                               for plant_type in PLANT_PLOTTING],
+                     value='COAL'),
+        dcc.Dropdown(id='year-dropdown',
+                     options=[{'label': '2004', 'value': 2004}, {'label': '2014',\
+                                                                  'value': 2014},
+                              {'label': '2022', 'value': 2022}],
+                     value=2004),
+        dcc.Graph(id='treemap-graph')  
+    ])
 #dropdown for the treemap - year and fuel type
 @callback(
     Output('treemap-graph', 'figure'),
     [Input('year-dropdown', 'value'),
      Input('type-dropdown', 'value')]
 )
+@figure_cache()
 def update_treemap(selected_year, selected_type):
-    return create_treemap(data_chart, selected_type, selected_year)
\ No newline at end of file
+    _, plant_counts = load_plant_types()
+    return create_treemap(plant_counts, selected_type, selected_year)
@@ -2,35 +2,104 @@
 Run the app or the getdata script, depending on the input provided
 - To run the dashboard, type "python -m lie_brary dashboard"
 - To run update data, type "python -m lie_brary getdata"
+- To serve the dashboard with several workers, type "python -m watts_up serve"
 
 # Author: Jacob Trout
 '''
-import sys
+import argparse
+import os
 from watts_up.data_processing import get_data
 from watts_up import app
+from watts_up.data_viz import data_manager
+from watts_up.util.util import (SERVE_HOST, SERVE_PORT, SERVE_WORKERS,
+                                SERVE_THREADS, SERVE_GRACEFUL_TIMEOUT)
 
-def run_getdata():
-    '''Run the getdata script'''
-    get_data.run_etl()
+def run_getdata(targets=None, jobs=4, force=False, incremental=False,
+                workers=None):
+    '''Run the getdata script
+    incremental=True only fetches price data newer than the saved data'''
+    get_data.run_etl(targets, jobs=jobs, force=force, incremental=incremental,
+                     egrid_workers=workers)
 
-def run_dash():
+def run_dash(warm_up=False, debug=True):
     '''Run the dash app
-    for local testing: debug=True'''
-    app.app.run_server(debug=True,port = 1230)
+    for local testing: debug=True
+    warm_up=True loads the data of every page in the background'''
+    # in debug mode the reloader's parent process only watches the files and
+    # restarts the child serving the requests, so only the child loads data
+    serving = not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+    if warm_up and serving:
+        data_manager.warm_up(background=True)
+    app.app.run_server(debug=debug,port = 1230)
+
+def run_serve(host, port, workers, threads, graceful_timeout):
+    '''Serve the dash app with gunicorn, for production use'''
+    # gunicorn is not available on every platform, so it is only imported
+    # when serving
+    from watts_up import serve
+    serve.serve(host=host, port=port, workers=workers, threads=threads,
+                graceful_timeout=graceful_timeout)
 
 
 message = ('To run the dashboard, type "python -m watts_up dashboard" | '
-            'To run update data, type "python -m watts_up getdata"')
+            'To serve the dashboard with several workers, type '
+            '"python -m watts_up serve" | '
+            'To run update data, type "python -m watts_up getdata" '
+            '(add "--incremental" to only fetch new price data)')
+
+
+def parse_args(args=None):
+    '''Parse the command line arguments'''
+    parser = argparse.ArgumentParser(prog="python -m watts_up")
+    commands = parser.add_subparsers(dest="command")
+    dashboard = commands.add_parser("dashboard", help="run the dashboard")
+    dashboard.add_argument("--warm-up", action="store_true",
+                           help="load the data of every page in the "
+                                "background at start-up")
+    serve = commands.add_parser("serve", help="serve the dashboard with "
+                                "several worker processes")
+    serve.add_argument("--host", default=SERVE_HOST,
+                       help="address to listen on (default: %(default)s)")
+    serve.add_argument("-p", "--port", type=int, default=SERVE_PORT,
+                       help="port to listen on (default: %(default)s)")
+    serve.add_argument("-w", "--workers", type=int, default=SERVE_WORKERS,
+                       help="worker processes (default: one per core)")
+    serve.add_argument("-t", "--threads", type=int, default=SERVE_THREADS,
+                       help="threads per worker (default: %(default)s)")
+    serve.add_argument("--graceful-timeout", type=int,
+                       default=SERVE_GRACEFUL_TIMEOUT,
+                       help="seconds workers get to finish their requests "
+                            "on restart (default: %(default)s)")
+    getdata = commands.add_parser("getdata", help="run the ETL process")
+    getdata.add_argument("stages", nargs="*",
+                         help="stages to build with the stages they depend "
+                              "on (default: all), one of: "
+                              + ", ".join(get_data.stages()))
+    getdata.add_argument("-j", "--jobs", type=int, default=4,
+                         help="maximum number of stages run at once")
+    getdata.add_argument("-w", "--workers", type=int, default=None,
+                         help="processes parsing eGRID files "
+                              "(default: one per core)")
+    getdata.add_argument("-f", "--force", action="store_true",
+                         help="rebuild the named stages even if up to "
+                              "date; the stages they depend on are only "
+                              "rebuilt if out of date")
+    getdata.add_argument("--incremental", action="store_true",
+                         help="only fetch price data newer than the saved "
+                              "data")
+    return parser.parse_args(args)
 
 
 def main():
     '''Run the app or the getdata script, depending on the input provided'''
-    if len(sys.argv) > 1:
-        if sys.argv[1] == 'dashboard':
-            run_dash()
-        elif sys.argv[1] == 'getdata':
-            run_getdata()
-        else:
-            print("[Invalid Input Provided] " + message )
+    args = parse_args()
+    if args.command == 'dashboard':
+        run_dash(warm_up=args.warm_up)
+    elif args.command == 'serve':
+        run_serve(args.host, args.port, args.workers, args.threads,
+                  args.graceful_timeout)
+    elif args.command == 'getdata':
+        run_getdata(args.stages, jobs=args.jobs, force=args.force,
+                    incremental=args.incremental, workers=args.workers)
     else:
-        print("[No Input Provided] " + message)
\ No newline at end of file
+        print("[No Input Provided] " + message)
@@ -0,0 +1,80 @@
+'''
+Serves the Dash app with gunicorn, across several worker processes each
+running several threads. The data of every page is loaded before the
+workers are forked, so they share it copy-on-write instead of each loading
+its own copy.
+
+Send HUP to the master process to restart the workers gracefully: the old
+workers finish their requests while the new ones start.
+
+# Author: Jacob Trout
+'''
+import os
+from gunicorn.app.base import BaseApplication
+from watts_up import app
+from watts_up.data_viz import data_manager, db
+from watts_up.util.util import (SERVE_HOST, SERVE_PORT, SERVE_WORKERS,
+                                SERVE_THREADS, SERVE_TIMEOUT,
+                                SERVE_GRACEFUL_TIMEOUT, SERVE_MAX_REQUESTS)
+
+
+def post_fork(server, worker):
+    '''Drops the database connections inherited from the master: a sqlite
+    connection must not be used by two processes.'''
+    db.close_connections()
+
+
+class DashApplication(BaseApplication):
+    '''A gunicorn application serving a WSGI app loaded in the master.'''
+
+    def __init__(self, application, options):
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def serve(host=SERVE_HOST, port=SERVE_PORT, workers=SERVE_WORKERS,
+          threads=SERVE_THREADS, timeout=SERVE_TIMEOUT,
+          graceful_timeout=SERVE_GRACEFUL_TIMEOUT,
+          max_requests=SERVE_MAX_REQUESTS):
+    '''
+    Runs the dashboard under gunicorn until it is stopped.
+
+    Parameters:
+    - host, port: The address to listen on.
+    - workers: The number of worker processes. None uses one per core.
+    - threads: The number of threads of each worker.
+    - timeout: The seconds a request may take before its worker is restarted.
+    - graceful_timeout: The seconds workers get to finish their requests when
+      restarted or stopped.
+    - max_requests: The requests a worker serves before it is replaced, with
+      some jitter so the workers are not replaced at once. 0 disables it.
+    '''
+    # load every page's data once, in the master, before forking
+    data_manager.warm_up(background=False)
+    # Dash registers its callbacks and page routes on the first request,
+    # which races when the threads of a worker all start at once: serve one
+    # before forking so every worker starts set up
+    app.app.server.test_client().get("/")
+    db.close_connections()
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers or os.cpu_count() or 1,
+        "threads": threads,
+        "worker_class": "gthread",
+        "timeout": timeout,
+        "graceful_timeout": graceful_timeout,
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests // 10,
+        "preload_app": True,
+        "post_fork": post_fork,
+    }
+    DashApplication(app.app.server, options).run()
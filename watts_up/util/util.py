@@ -29,6 +29,49 @@ PARAMS = {
     "length": 5000
 }
 
+# settings for fetching the pages of the EIA API
+FETCH_WORKERS = 4
+FETCH_RETRIES = 5
+FETCH_BACKOFF = 0.5
+FETCH_TIMEOUT = 60
+# seconds before the fetched data is stale and the fetch stage runs again
+FETCH_MAX_AGE = 24 * 60 * 60
+
+# number of processes parsing the eGRID files, None uses one per core
+EGRID_WORKERS = None
+
+# start method of the ETL process pools: they start while other stages run
+# in threads, and forking a process with running threads can deadlock it
+PROCESS_START_METHOD = "spawn"
+
+# number of plant rows cleaned and loaded at a time
+PLANT_CHUNK_SIZE = 10000
+
+# renewable energy targets (%) the projections are computed for
+PROJECTION_TARGETS = list(range(1, 101))
+
+# trajectory models: last year projected, bootstrap samples and their seed,
+# width of the intervals and processes fitting states (None: one per core)
+PROJECTION_HORIZON = 2050
+BOOTSTRAP_SAMPLES = 200
+PROJECTION_SEED = 100
+CONFIDENCE_LEVEL = 0.95
+PROJECTION_WORKERS = None
+
+# production server: address, worker processes (None: one per core),
+# threads per worker, seconds a request may take, seconds workers get to
+# finish their requests on restart and requests before a worker is recycled
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 1230
+SERVE_WORKERS = None
+SERVE_THREADS = 4
+SERVE_TIMEOUT = 120
+SERVE_GRACEFUL_TIMEOUT = 30
+SERVE_MAX_REQUESTS = 5000
+
+# number of callback outputs kept by each page's figure cache
+FIGURE_CACHE_SIZE = 128
+
 
 STATE_MAPPING_DATA = {
     'state': ['Alabama', 'Alaska', 'Arizona', 'Arkansas', 'American Samoa', 'California', 'Colorado', 'Connecticut', 'Delaware', 'District of Columbia', 'Florida', 'Georgia', 'Guam', 'Hawaii', 'Idaho', 'Illinois', 'Indiana', 'Iowa', 'Kansas',
@@ -171,3 +214,24 @@ WANTED_COLUMNS = {
     'plgenaso': "Solar",
     'other_sources': "Other"
 }
+
+# plant types used on the trends page
+COLUMNS_WANTED = {
+    'plgenacl': "COAL",
+    'plgenags': "GAS",
+    'plgenanc': "NUCLEAR",
+    'plgenawi': "WIND",
+    'plgenaso': "SOLAR"
+}
+
+# plant type labels, by the name of the pages using them
+PLANT_TAXONOMIES = {
+    'analysis': WANTED_COLUMNS,
+    'trend': COLUMNS_WANTED
+}
+
+# columns of the plants table holding the label of each taxonomy
+PLANT_TYPE_COLUMNS = {
+    'analysis': 'plant_type',
+    'trend': 'trend_plant_type'
+}